@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""Inverted-file (IVF-flat) approximate search over chunk embeddings.
+
+Centroids come from a spherical k-means over the normalised chunk matrix held
+by vector_store.ChunkIndex. Every chunk is assigned to its nearest centroid and
+a query only scores the chunks in its `nprobe` closest lists. Centroids and
+assignments are persisted next to VECTOR_DB_PATH so the expensive training
+step survives restarts; new chunks are assigned incrementally.
+"""
+
+import argparse
+import os
+import time
+from typing import Optional
+
+import numpy as np
+
+from config import ANN_INDEX_PATH
+
+
+def _kmeans(data: np.ndarray, nlist: int, n_iter: int = 12, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on L2-normalised rows; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = data[rng.choice(len(data), size=empty.size, replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """IVF-flat index that borrows its vectors from a ChunkIndex."""
+
+    def __init__(self, path: str = ANN_INDEX_PATH):
+        self.path = path
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_on = 0
+        # Persisted assignments, keyed by chunks.id and kept sorted for lookups.
+        self._row_ids = np.zeros(0, dtype=np.int64)
+        self._row_lists = np.zeros(0, dtype=np.int32)
+        # Per-position list ids for the ChunkIndex generation we last synced with.
+        self._pos_lists = np.zeros(0, dtype=np.int32)
+        self._generation = None
+        self._order = None
+        self._offsets = None
+        self._tried_disk = False
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def load(self) -> bool:
+        self._tried_disk = True
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                self.centroids = data["centroids"].astype(np.float32)
+                self._row_ids = data["row_ids"].astype(np.int64)
+                self._row_lists = data["lists"].astype(np.int32)
+                self.trained_on = int(data["trained_on"])
+        except Exception as exc:
+            print(f"[warn] Failed to load ANN index {self.path}: {exc}")
+            self.centroids = None
+            return False
+        self._generation = None
+        return True
+
+    def save(self, index):
+        if self.centroids is None:
+            return
+        live = np.flatnonzero(index.alive[: index.size] & (self._pos_lists[: index.size] >= 0))
+        row_ids = index.row_ids[live]
+        order = np.argsort(row_ids)
+        self._row_ids = row_ids[order]
+        self._row_lists = self._pos_lists[live][order]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        np.savez(
+            tmp,
+            centroids=self.centroids,
+            row_ids=self._row_ids,
+            lists=self._row_lists,
+            trained_on=np.int64(self.trained_on),
+        )
+        os.replace(tmp, self.path)
+
+    def build(self, index, nlist: Optional[int] = None, seed: int = 0):
+        """Train centroids on the live rows of `index` and assign everything."""
+        live = np.flatnonzero(index.alive[: index.size])
+        if live.size == 0:
+            return
+        nlist = nlist or int(np.clip(np.sqrt(live.size), 8, 4096))
+        nlist = min(nlist, live.size)
+        rng = np.random.default_rng(seed)
+        sample = live if live.size <= nlist * 32 else rng.choice(live, size=nlist * 32, replace=False)
+        started = time.perf_counter()
+        self.centroids = _kmeans(index.vectors(sample), nlist, seed=seed)
+        self.trained_on = int(live.size)
+        self._pos_lists = np.full(index.size, -1, dtype=np.int32)
+        self._generation = index.generation
+        self._assign(index, live)
+        self.save(index)
+        print(f"[ann] trained {nlist} lists on {live.size} chunks in {time.perf_counter() - started:.1f}s")
+
+    def _assign(self, index, positions: np.ndarray, block: int = 65536):
+        for lo in range(0, positions.size, block):
+            pos = positions[lo : lo + block]
+            self._pos_lists[pos] = np.argmax(index.vectors(pos) @ self.centroids.T, axis=1)
+        self._order = None
+
+    def sync(self, index) -> bool:
+        """Bring per-position assignments in line with `index`; returns True if anything changed."""
+        if self.centroids is None:
+            return False
+        changed = False
+        if self._generation != index.generation:
+            # Positions were renumbered (reload/compaction): remap from row ids.
+            self._pos_lists = np.full(index.size, -1, dtype=np.int32)
+            row_ids = index.row_ids[: index.size]
+            if self._row_ids.size:
+                idx = np.clip(np.searchsorted(self._row_ids, row_ids), 0, self._row_ids.size - 1)
+                found = self._row_ids[idx] == row_ids
+                self._pos_lists[found] = self._row_lists[idx[found]]
+            self._generation = index.generation
+            self._order = None
+        elif self._pos_lists.size < index.size:
+            grown = np.full(index.size, -1, dtype=np.int32)
+            grown[: self._pos_lists.size] = self._pos_lists
+            self._pos_lists = grown
+        missing = np.flatnonzero(index.alive[: index.size] & (self._pos_lists[: index.size] < 0))
+        if missing.size:
+            self._assign(index, missing)
+            changed = True
+        return changed
+
+    def _lists(self):
+        if self._order is None:
+            assigned = np.flatnonzero(self._pos_lists >= 0)
+            lists = self._pos_lists[assigned]
+            self._order = assigned[np.argsort(lists, kind="stable")]
+            self._offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.nlist))])
+        return self._order, self._offsets
+
+    def candidates(self, index, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Return live positions from the `nprobe` lists closest to `query`."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        order, offsets = self._lists()
+        parts = [order[offsets[p] : offsets[p + 1]] for p in probe]
+        positions = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        return positions[index.alive[positions]]
+
+    def ensure_ready(self, index):
+        """Load or train lazily; retrain when the corpus has outgrown the centroids."""
+        if self.centroids is None and not self._tried_disk:
+            self.load()
+        live = index.size - index.dead
+        if self.centroids is None or (self.centroids.shape[1] != index.dim) or live > 4 * self.trained_on:
+            self.build(index)
+        elif self.sync(index):
+            self.save(index)
+
+
+def recall_report(k: int = 10, n_queries: int = 200, nprobes=(1, 2, 4, 8, 16, 32, 64), noise: float = 0.05, seed: int = 0):
+    """Print recall@k and latency of IVF search against exact search."""
+    import vector_store
+
+    index = vector_store.get_index()
+    index.ensure_loaded()
+    live = np.flatnonzero(index.alive[: index.size])
+    if live.size == 0:
+        print("Vector index is empty.")
+        return
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(live, size=min(n_queries, live.size), replace=False)
+    # Perturbed stored chunks stand in for real queries.
+    queries = index.vectors(picks) + rng.normal(scale=noise, size=(picks.size, index.dim)).astype(np.float32)
+
+    def run(**kwargs):
+        hits, started = [], time.perf_counter()
+        for q in queries:
+            hits.append({(r["session_path"], r["chunk_id"]) for r in vector_store.search_similar(q, top_k=k, **kwargs)})
+        return hits, (time.perf_counter() - started) * 1000 / len(queries)
+
+    exact, exact_ms = run(exact=True)
+    print(f"chunks={live.size} dim={index.dim} queries={len(queries)} k={k}")
+    print(f"{'mode':>12} {'recall@k':>9} {'ms/query':>9}")
+    print(f"{'exact':>12} {1.0:>9.3f} {exact_ms:>9.2f}")
+    for nprobe in nprobes:
+        approx, ms = run(nprobe=nprobe, ann_min_chunks=0)
+        recall = np.mean([len(a & e) / max(1, len(e)) for a, e in zip(approx, exact)])
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:>9.3f} {ms:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or evaluate the approximate chunk index.")
+    parser.add_argument("--build", action="store_true", help="Retrain centroids from the current vector index.")
+    parser.add_argument("--nlist", type=int, default=None, help="Number of IVF lists (default: sqrt of chunk count).")
+    parser.add_argument("--report", action="store_true", help="Print recall@k against exact search.")
+    parser.add_argument("-k", type=int, default=10, help="k for recall@k.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled queries for the report.")
+    args = parser.parse_args()
+
+    import vector_store
+
+    if args.build:
+        index = vector_store.get_index()
+        index.ensure_loaded()
+        with index.lock:
+            vector_store.get_ann_index().build(index, nlist=args.nlist)
+    if args.report:
+        recall_report(k=args.k, n_queries=args.queries)
+    if not (args.build or args.report):
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+"""Cache of aligned ASR output and speaker embeddings per audio file.
+
+Entries are keyed by sha256 of the audio bytes plus the ASR model, language,
+compute type and VAD parameters. Each entry holds the aligned WhisperX
+segments (text and word timings), the VAD summary, and the resemblyzer
+embedding of every segment long enough to embed. Re-diarizing a file, which means new clustering settings, new
+voiceprints or new chunking, then rebuilds the transcript from the cache
+without decoding the audio or running any acoustic model. The table keeps
+at most ASR_CACHE_MAX_ENTRIES rows, evicting the least recently used.
+
+Audio hashes are remembered by (path, size, mtime), so a hit does not reread
+the file either.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import ASR_CACHE_DB_PATH, ASR_CACHE_ENABLED, ASR_CACHE_MAX_ENTRIES
+
+
+def result_key(audio_hash: str, model: str, language: str, compute_type: str, vad: str = "off") -> str:
+    """`vad` describes the speech trimming applied before ASR ("off" or "<threshold>/<min silence>")."""
+    parts = (audio_hash, model, language, compute_type, vad)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ASRCache:
+    def __init__(self, db_path: str = ASR_CACHE_DB_PATH, max_entries: int = ASR_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS asr_results (
+                    key TEXT PRIMARY KEY,
+                    audio_hash TEXT,
+                    model TEXT,
+                    language TEXT,
+                    compute_type TEXT,
+                    segments BLOB,
+                    embedded BLOB,
+                    embeddings BLOB,
+                    duration REAL,
+                    vad TEXT,
+                    last_used REAL
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(asr_results)")}
+            if "vad" not in columns:
+                conn.execute("ALTER TABLE asr_results ADD COLUMN vad TEXT")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audio_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    sha256 TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_asr_results_used ON asr_results(last_used)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def audio_hash(self, path: str) -> str:
+        """sha256 of the file contents, reused while size and mtime are unchanged."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute("SELECT size, mtime_ns, sha256 FROM audio_hashes WHERE path = ?", (path,)).fetchone()
+                conn.close()
+                if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                    return row[2]
+            except Exception as exc:
+                print(f"[warn] ASR cache hash lookup failed: {exc}")
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha = digest.hexdigest()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO audio_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                    (path, st.st_size, st.st_mtime_ns, sha),
+                )
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to remember audio hash: {exc}")
+        return sha
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return {"language", "segments", "embeddings", "duration", "vad"} or None.
+
+        `embeddings` maps segment positions to float32 vectors.
+        """
+        with self._lock:
+            row = None
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT language, segments, embedded, embeddings, duration, vad FROM asr_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    conn.execute("UPDATE asr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] ASR cache lookup failed: {exc}")
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        language, segments, embedded, embeddings, duration, vad = row
+        positions = np.frombuffer(embedded, dtype=np.int64) if embedded else np.zeros(0, dtype=np.int64)
+        matrix = np.frombuffer(embeddings, dtype=np.float32).reshape(len(positions), -1) if len(positions) else None
+        return {
+            "language": language,
+            "segments": json.loads(zlib.decompress(segments).decode("utf-8")),
+            "embeddings": {int(p): matrix[i].copy() for i, p in enumerate(positions)},
+            "duration": duration,
+            "vad": json.loads(vad) if vad else None,
+        }
+
+    def put(
+        self,
+        key: str,
+        audio_hash: str,
+        model: str,
+        language: str,
+        compute_type: str,
+        segments: List[Dict],
+        embeddings: Dict[int, np.ndarray],
+        duration: float,
+        vad: Optional[Dict] = None,
+    ):
+        positions = sorted(embeddings)
+        matrix = np.stack([embeddings[p] for p in positions]).astype(np.float32) if positions else np.zeros(0, np.float32)
+        blob = zlib.compress(json.dumps(segments, ensure_ascii=False, default=float).encode("utf-8"))
+        row = (
+            key,
+            audio_hash,
+            model,
+            language,
+            compute_type,
+            blob,
+            np.asarray(positions, dtype=np.int64).tobytes(),
+            matrix.tobytes(),
+            float(duration),
+            json.dumps(vad) if vad else None,
+            time.time(),
+        )
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO asr_results (key, audio_hash, model, language, compute_type, segments, "
+                    "embedded, embeddings, duration, vad, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM asr_results").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM asr_results WHERE key IN "
+                        "(SELECT key FROM asr_results ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to store ASR result in cache: {exc}")
+
+    def clear(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM asr_results")
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to clear ASR cache: {exc}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size, hours = 0, 0.0
+            try:
+                conn = self._connect()
+                size, seconds = conn.execute("SELECT COUNT(*), COALESCE(SUM(duration), 0) FROM asr_results").fetchone()
+                hours = seconds / 3600.0
+                conn.close()
+            except Exception:
+                pass
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "audio_hours": round(hours, 2),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[ASRCache] = None
+
+
+def get_asr_cache() -> Optional[ASRCache]:
+    """Process-wide cache, or None when ASR_CACHE_ENABLED is off."""
+    global _cache
+    if not ASR_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ASRCache()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the cached ASR results.")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached result.")
+    args = parser.parse_args()
+    cache = ASRCache()
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Audio decoding shared by the transcription stages.
+
+Each file is decoded once, by ffmpeg, straight to 16 kHz mono float32 PCM.
+That is the format WhisperX, its aligner and resemblyzer expect, so the
+array can be handed to every stage without decoding or resampling again.
+"""
+
+import shutil
+import subprocess
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def decode_audio(path: str, sr: int = SAMPLE_RATE, offset: float = 0.0, duration: Optional[float] = None) -> np.ndarray:
+    """Decode `path` to mono float32 at `sr` Hz, optionally from `offset` seconds for `duration` seconds."""
+    if shutil.which("ffmpeg") is None:
+        import librosa
+
+        print("[warn] ffmpeg not found on PATH; decoding with librosa (slower).")
+        audio, _ = librosa.load(path, sr=sr, mono=True, offset=offset, duration=duration)
+        return audio.astype(np.float32, copy=False)
+    cmd = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "0"]
+    if offset > 0:
+        cmd += ["-ss", f"{offset:.3f}"]
+    cmd += ["-i", path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-vn", "-ac", "1", "-ar", str(sr), "-f", "f32le", "-acodec", "pcm_f32le", "-"]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode {path}: {proc.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(proc.stdout, dtype=np.float32).copy()
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duration of `path` in seconds without decoding it (None when unknown)."""
+    if shutil.which("ffprobe") is not None:
+        cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+        try:
+            return float(proc.stdout.decode().strip())
+        except ValueError:
+            pass
+    try:
+        import soundfile as sf
+
+        return float(sf.info(path).duration)
+    except Exception:
+        return None
+
+
+class StageTimer:
+    """Accumulates wall time per named stage of one run."""
+
+    def __init__(self):
+        self.stages: "OrderedDict[str, float]" = OrderedDict()
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(sec, 3) for name, sec in self.stages.items()}
+
+    def report(self, audio_seconds: Optional[float] = None) -> str:
+        parts = [f"{name} {sec:.1f}s ({100 * sec / max(self.total, 1e-9):.0f}%)" for name, sec in self.stages.items()]
+        line = " | ".join(parts) + f" | total {self.total:.1f}s"
+        if audio_seconds:
+            line += f" for {audio_seconds:.0f}s audio (RTF {self.total / audio_seconds:.2f})"
+        return line
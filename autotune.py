@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""Find the fastest ASR configuration for this machine that stays accurate.
+
+A short reference clip is transcribed with every combination of model size,
+compute type, torch/CTranslate2 thread count and batch size. For each run the
+script reports the real-time factor (RTF, wall time over audio time; lower is
+faster) and the similarity of its transcript to the reference transcript.
+The reference is the transcript of the largest candidate model at float32,
+or a text file passed with --reference-text. The fastest configuration whose
+similarity is at least --floor is written to settings.json. load_pipeline,
+the model registry and the live path read it from there, so restart the
+server afterwards.
+
+    python autotune.py --clip recordings/meeting.wav --seconds 60
+    python autotune.py --models small medium --compute-types int8 float32 --dry-run
+"""
+
+import argparse
+import difflib
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import torch
+
+import settings
+from audio_io import SAMPLE_RATE, decode_audio
+from config import ASR_MODEL, RECORDINGS_FOLDER
+from model_registry import asr_params_m, default_device, get_registry
+
+AUDIO_SUFFIXES = {".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm"}
+COMPUTE_TYPES = {
+    "cpu": ["int8", "int8_float32", "float32"],
+    "cuda": ["float16", "int8_float16", "float32"],
+}
+
+
+def default_clip() -> Optional[str]:
+    """First recording (by name) in RECORDINGS_FOLDER, if any."""
+    base = Path(RECORDINGS_FOLDER)
+    if not base.is_dir():
+        return None
+    clips = sorted(p for p in base.rglob("*") if p.is_file() and p.suffix.lower() in AUDIO_SUFFIXES)
+    return str(clips[0]) if clips else None
+
+
+def default_threads(device: str) -> List[int]:
+    if device == "cuda":
+        return [0]
+    cores = os.cpu_count() or 1
+    return sorted({max(1, cores // 4), max(1, cores // 2), cores})
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"[\w']+", text.lower())
+
+
+def similarity(reference: List[str], hypothesis: List[str]) -> float:
+    """Word-sequence similarity in [0, 1] (1 means identical word sequences)."""
+    if not reference and not hypothesis:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference, hypothesis, autojunk=False).ratio()
+
+
+def transcribe_text(model, audio, batch_size: int) -> str:
+    result = model.transcribe(audio, batch_size=batch_size)
+    return " ".join(seg.get("text", "").strip() for seg in result.get("segments", []))
+
+
+def run_grid(
+    audio,
+    models: List[str],
+    compute_types: List[str],
+    threads_options: List[int],
+    batch_sizes: List[int],
+    language: str,
+    device: str,
+    reference: Optional[List[str]],
+    repeats: int,
+) -> List[Dict]:
+    """Time every configuration; the first (model, compute type) run sets the reference if none is given."""
+    registry = get_registry()
+    clip_seconds = len(audio) / SAMPLE_RATE
+    warm = audio[: 10 * SAMPLE_RATE]
+    rows = []
+    for model_name in models:
+        for compute_type in compute_types:
+            for threads in threads_options:
+                if threads:
+                    torch.set_num_threads(threads)
+                started = time.perf_counter()
+                try:
+                    model = registry.asr(model_name, language, compute_type, device, threads)
+                    transcribe_text(model, warm, batch_sizes[0])
+                except Exception as exc:
+                    print(f"[warn] {model_name}/{compute_type}/{threads} threads unavailable: {exc}")
+                    continue
+                load_seconds = time.perf_counter() - started
+                for batch_size in batch_sizes:
+                    elapsed, text = float("inf"), ""
+                    for _ in range(repeats):
+                        started = time.perf_counter()
+                        text = transcribe_text(model, audio, batch_size)
+                        elapsed = min(elapsed, time.perf_counter() - started)
+                    hyp = words(text)
+                    if reference is None:
+                        reference = hyp
+                    row = {
+                        "model": model_name,
+                        "compute_type": compute_type,
+                        "threads": threads,
+                        "batch_size": batch_size,
+                        "load_seconds": load_seconds,
+                        "rtf": elapsed / clip_seconds,
+                        "similarity": similarity(reference, hyp),
+                    }
+                    rows.append(row)
+                    print(
+                        f"{model_name:>14} {compute_type:>13} {threads:>7} {batch_size:>5} "
+                        f"{load_seconds:>7.1f} {row['rtf']:>7.3f} {row['similarity']:>6.3f}"
+                    )
+                registry.evict(("asr", model_name, language, compute_type, device, threads))
+    return rows
+
+
+def main():
+    device = default_device()
+    parser = argparse.ArgumentParser(description="Benchmark ASR settings and store the fastest accurate one.")
+    parser.add_argument("--clip", default=None, help="Reference audio (default: first file in the recordings folder).")
+    parser.add_argument("--offset", type=float, default=0.0, help="Start of the clip within the file (s).")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Length of the clip (s).")
+    parser.add_argument("--models", nargs="+", default=None, help="Model sizes (default: the configured models and 'small').")
+    parser.add_argument("--compute-types", nargs="+", default=COMPUTE_TYPES[device])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=default_threads(device), help="0 keeps the defaults.")
+    parser.add_argument("--language", default=None)
+    parser.add_argument("--floor", type=float, default=0.9, help="Minimum transcript similarity to the reference.")
+    parser.add_argument("--reference-text", default=None, help="Text file with a trusted transcript of the clip.")
+    parser.add_argument("--repeats", type=int, default=1, help="Timed runs per configuration (the fastest counts).")
+    parser.add_argument("--dry-run", action="store_true", help="Report only; leave settings.json unchanged.")
+    args = parser.parse_args()
+
+    clip = args.clip or default_clip()
+    if not clip or not os.path.exists(clip):
+        parser.error("no reference clip; pass --clip")
+    audio = decode_audio(clip, offset=args.offset, duration=args.seconds)
+    if not len(audio):
+        parser.error(f"{clip} has no audio at offset {args.offset}s")
+    language = args.language or settings.get_language()
+    models = args.models or list(dict.fromkeys([ASR_MODEL, settings.get_asr_model(), "small"]))
+    # Most accurate candidate first, so its transcript becomes the reference.
+    models.sort(key=asr_params_m, reverse=True)
+    compute_types = sorted(args.compute_types, key=lambda c: c != "float32")
+    reference = None
+    if args.reference_text:
+        with open(args.reference_text, "r", encoding="utf-8") as f:
+            reference = words(f.read())
+
+    print(f"clip={clip} seconds={len(audio) / SAMPLE_RATE:.1f} device={device} language={language}")
+    print(f"{'model':>14} {'compute':>13} {'threads':>7} {'batch':>5} {'load s':>7} {'RTF':>7} {'sim':>6}")
+    rows = run_grid(
+        audio,
+        models,
+        compute_types,
+        args.threads,
+        args.batch_sizes,
+        language,
+        device,
+        reference,
+        max(1, args.repeats),
+    )
+    passing = [r for r in rows if r["similarity"] >= args.floor]
+    if not passing:
+        print(f"No configuration reached similarity {args.floor}; settings unchanged.")
+        return
+    best = min(passing, key=lambda r: r["rtf"])
+    print(
+        f"Fastest above floor {args.floor}: {best['model']} {best['compute_type']} "
+        f"threads={best['threads']} batch={best['batch_size']} (RTF {best['rtf']:.3f}, similarity {best['similarity']:.3f})"
+    )
+    if args.dry_run:
+        return
+    settings.set_asr_tuning(best["model"], best["compute_type"], best["batch_size"], best["threads"])
+    print(f"Saved to {settings.SETTINGS_FILE}; restart the server to load it.")
+
+
+if __name__ == "__main__":
+    main()
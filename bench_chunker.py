@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Benchmark the dict-based and array-backed chunkers on synthetic transcripts.
+
+Generates a long multi-speaker transcript (word timings on most segments,
+text-only segments mixed in), checks both chunkers agree chunk for chunk,
+and prints the best-of-N timings and peak memory of each pipeline.
+
+    python bench_chunker.py --hours 10
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from chunker import WordArrays, chunk_word_arrays, chunk_words, flatten_words
+
+
+def synthetic_segments(hours: float, speakers: int = 4, wpm: float = 150.0, seed: int = 0):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(5000)]
+    total = hours * 3600.0
+    word_dur = 60.0 / wpm
+    segments, t = [], 0.0
+    while t < total:
+        n = rng.randint(4, 40)
+        speaker = f"SPEAKER_{rng.randrange(speakers):02d}"
+        tokens = [rng.choice(vocab) for _ in range(n)]
+        seg = {"start": t, "end": t + n * word_dur, "speaker": speaker, "text": " ".join(tokens)}
+        if rng.random() < 0.9:
+            seg["words"] = []
+            for i, tok in enumerate(tokens):
+                # Jitter so some words overlap their predecessor (exercises the monotonic fix-up).
+                ws = t + i * word_dur + rng.uniform(-0.05, 0.05)
+                seg["words"].append({"word": " " + tok, "start": ws, "end": ws + word_dur * 0.9})
+        segments.append(seg)
+        t = seg["end"] + rng.uniform(0.0, 1.5)
+    return segments
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_mib(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunk_words with the array-backed chunker.")
+    parser.add_argument("--hours", type=float, default=10.0, help="Length of the synthetic transcript.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; the best is reported.")
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.hours)
+    words = flatten_words(segments)
+    print(f"{len(segments)} segments, {len(words)} words ({args.hours:g} h)")
+
+    reference = chunk_words(flatten_words(segments))
+    vectorized = chunk_word_arrays(WordArrays.from_segments(segments))
+    if reference != vectorized:
+        raise SystemExit("Chunk output differs between chunk_words and chunk_word_arrays")
+    print(f"{len(reference)} chunks, outputs identical")
+
+    dict_flat = best_of(lambda: flatten_words(segments), args.repeat)
+    dict_chunk = best_of(lambda: chunk_words(words), args.repeat)
+    arrays = WordArrays.from_segments(segments)
+    arr_flat = best_of(lambda: WordArrays.from_segments(segments), args.repeat)
+    arr_chunk = best_of(lambda: chunk_word_arrays(arrays), args.repeat)
+
+    print(f"{'stage':>10} {'dicts (ms)':>11} {'arrays (ms)':>12} {'speedup':>8}")
+    for name, a, b in (("flatten", dict_flat, arr_flat), ("chunk", dict_chunk, arr_chunk), ("total", dict_flat + dict_chunk, arr_flat + arr_chunk)):
+        print(f"{name:>10} {a * 1000:>11.1f} {b * 1000:>12.1f} {a / b:>7.1f}x")
+    dict_mem = peak_mib(lambda: chunk_words(flatten_words(segments)))
+    arr_mem = peak_mib(lambda: chunk_word_arrays(WordArrays.from_segments(segments)))
+    print(f"peak memory: dicts {dict_mem:.1f} MiB, arrays {arr_mem:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
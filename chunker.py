@@ -6,7 +6,9 @@ index and retrieve meaningful slices of a conversation.
 
 import json
 import os
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
 
 from config import CHUNK_MAX_WORDS, CHUNK_MIN_WORDS, CHUNK_OVERLAP_SECONDS
 
@@ -65,15 +67,41 @@ def flatten_words(segments: List[Dict]) -> List[Dict]:
         end = float(seg.get("end", start))
         words.extend(_segment_words_with_fallback(seg, start, end))
 
+    _shift_monotonic(words, 0.0)
+    return words
+
+
+def _shift_monotonic(words: List[Dict], last_end: float) -> float:
+    """Shift words that start before `last_end` forward in place; returns the new last end."""
     # Ensure monotonically increasing timestamps to avoid pathological overlaps.
-    last_end = 0.0
     for w in words:
         if w["start"] < last_end:
             delta = last_end - w["start"]
             w["start"] += delta
             w["end"] += delta
         last_end = max(last_end, w["end"])
-    return words
+    return last_end
+
+
+def _words_chunk(chunk_slice: List[Dict], index: int) -> Dict:
+    return {
+        "chunk_id": f"chunk_{index:04d}",
+        "start": float(chunk_slice[0]["start"]),
+        "end": float(chunk_slice[-1]["end"]),
+        "speakers": sorted({w.get("speaker", "Unknown") for w in chunk_slice}),
+        "text": " ".join(w["word"] for w in chunk_slice).strip(),
+    }
+
+
+def _overlap_start(words: List[Dict], start_idx: int, end_idx: int, overlap_seconds: float) -> int:
+    """Index where the next window starts so it re-covers the last `overlap_seconds` of this one."""
+    overlap_start_time = words[end_idx - 1]["end"] - overlap_seconds
+    # Step back until we include the overlap window.
+    back_idx = end_idx
+    while back_idx > start_idx and words[back_idx - 1]["start"] >= overlap_start_time:
+        back_idx -= 1
+    # A window shorter than the overlap would never advance; drop the overlap instead.
+    return back_idx if back_idx > start_idx else end_idx
 
 
 def chunk_words(
@@ -105,38 +133,201 @@ def chunk_words(
         chunk_slice = words[start_idx:end_idx]
         if not chunk_slice:
             break
+        chunks.append(_words_chunk(chunk_slice, len(chunks)))
+
+        # Move start_idx forward with overlap.
+        if overlap_seconds > 0 and end_idx < len(words):
+            end_idx = _overlap_start(words, start_idx, end_idx, overlap_seconds)
+        start_idx = end_idx
+
+    return chunks
+
+
+class WordArrays:
+    """Flattened words as parallel arrays instead of one dict per word.
+
+    `starts`/`ends` are float64 seconds, `speakers` are codes into
+    `speaker_names`, and word i is `text[offsets[i]:offsets[i] + lengths[i]]`
+    in a single space-joined buffer, so a window's text is one slice.
+    """
+
+    def __init__(self, words: List[str], starts, ends, speakers, speaker_names: List[str]):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.speakers = np.asarray(speakers, dtype=np.int32)
+        self.speaker_names = speaker_names
+        self.lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        self.offsets = np.zeros(len(words), dtype=np.int64)
+        if len(words) > 1:
+            np.cumsum(self.lengths[:-1] + 1, out=self.offsets[1:])
+        self.text = " ".join(words)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_words(cls, words: List[Dict]) -> "WordArrays":
+        codes: Dict[str, int] = {}
+        speakers = [codes.setdefault(w.get("speaker", "Unknown"), len(codes)) for w in words]
+        return cls(
+            [w["word"] for w in words],
+            [w["start"] for w in words],
+            [w["end"] for w in words],
+            speakers,
+            list(codes),
+        )
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict]) -> "WordArrays":
+        """Equivalent to `flatten_words(segments)` without building per-word dicts."""
+        words: List[str] = []
+        starts: List[float] = []
+        ends: List[float] = []
+        codes: Dict[str, int] = {}
+        seg_codes: List[int] = []
+        seg_counts: List[int] = []
+        for seg in segments:
+            seg_start = float(seg.get("start", 0.0))
+            seg_end = float(seg.get("end", seg_start))
+            raw_words = seg.get("words")
+            if raw_words:
+                words.extend([w.get("word", "").strip() for w in raw_words])
+                starts.extend([float(w.get("start", seg_start)) for w in raw_words])
+                ends.extend([float(w.get("end", seg_end)) for w in raw_words])
+                count = len(raw_words)
+            else:
+                tokens = seg.get("text", "").split()
+                if not tokens:
+                    continue
+                step = max(0.001, float(seg_end - seg_start)) / max(1, len(tokens))
+                for idx, tok in enumerate(tokens):
+                    start = seg_start + idx * step
+                    words.append(tok)
+                    starts.append(start)
+                    ends.append(min(seg_end, start + step))
+                count = len(tokens)
+            seg_codes.append(codes.setdefault(seg.get("speaker", "Unknown"), len(codes)))
+            seg_counts.append(count)
+
+        speakers = np.repeat(np.asarray(seg_codes, dtype=np.int32), np.asarray(seg_counts, dtype=np.int64))
+        arrays = cls(words, starts, ends, speakers, list(codes))
+        # Same monotonic fix-up as flatten_words; the scalar pass only runs when something overlaps.
+        prev_end = np.concatenate([[0.0], np.maximum.accumulate(arrays.ends)[:-1]]) if len(arrays) else arrays.ends
+        if np.any(arrays.starts < np.maximum(prev_end, 0.0)):
+            st, en = arrays.starts.tolist(), arrays.ends.tolist()
+            last_end = 0.0
+            for i in range(len(st)):
+                if st[i] < last_end:
+                    delta = last_end - st[i]
+                    st[i] += delta
+                    en[i] += delta
+                last_end = max(last_end, en[i])
+            arrays.starts = np.asarray(st, dtype=np.float64)
+            arrays.ends = np.asarray(en, dtype=np.float64)
+        return arrays
 
-        chunk_start = chunk_slice[0]["start"]
-        chunk_end = chunk_slice[-1]["end"]
-        text = " ".join(w["word"] for w in chunk_slice).strip()
-        speakers = sorted({w.get("speaker", "Unknown") for w in chunk_slice})
 
+def chunk_word_arrays(
+    arrays: WordArrays,
+    max_words: int = CHUNK_MAX_WORDS,
+    min_words: int = CHUNK_MIN_WORDS,
+    overlap_seconds: float = CHUNK_OVERLAP_SECONDS,
+) -> List[Dict]:
+    """Array-backed `chunk_words`: identical chunks, with window ends and overlap starts found by index math."""
+    chunks: List[Dict] = []
+    n = len(arrays)
+    # Growth to max_words followed by the min_words top-up collapses to one width.
+    width = max(max_words, min_words, 0)
+    if n == 0 or width == 0:
+        return chunks
+    starts, ends = arrays.starts, arrays.ends
+    monotonic = n < 2 or bool(np.all(starts[1:] >= starts[:-1]))
+
+    start_idx = 0
+    while start_idx < n:
+        end_idx = min(n, start_idx + width)
+        chunk_end = ends[end_idx - 1]
+        lo = arrays.offsets[start_idx]
+        hi = arrays.offsets[end_idx - 1] + arrays.lengths[end_idx - 1]
+        codes = np.unique(arrays.speakers[start_idx:end_idx])
         chunks.append(
             {
                 "chunk_id": f"chunk_{len(chunks):04d}",
-                "start": float(chunk_start),
+                "start": float(starts[start_idx]),
                 "end": float(chunk_end),
-                "speakers": speakers,
-                "text": text,
+                "speakers": sorted(arrays.speaker_names[c] for c in codes),
+                "text": arrays.text[lo:hi].strip(),
             }
         )
 
-        # Move start_idx forward with overlap.
-        if overlap_seconds > 0 and end_idx < len(words):
+        if overlap_seconds > 0 and end_idx < n:
             overlap_start_time = chunk_end - overlap_seconds
-            # Step back until we include the overlap window.
-            while end_idx > start_idx and words[end_idx - 1]["start"] >= overlap_start_time:
-                end_idx -= 1
+            # Last word in the window starting before the overlap point.
+            if monotonic:
+                back_idx = min(max(int(np.searchsorted(starts, overlap_start_time, side="left")), start_idx), end_idx)
+            else:
+                before = np.flatnonzero(starts[start_idx:end_idx] < overlap_start_time)
+                back_idx = start_idx + int(before[-1]) + 1 if before.size else start_idx
+            if back_idx > start_idx:
+                end_idx = back_idx
         start_idx = end_idx
 
     return chunks
 
 
+class StreamingChunker:
+    """Chunk a transcript while its segments are still arriving.
+
+    `feed` yields a chunk as soon as its window and the start of the next one
+    are fixed, i.e. once more words than one window have arrived after the
+    window start; `flush` yields the remaining tail. Fed the same segments,
+    the concatenated output equals `chunk_words(flatten_words(segments))`.
+    Both methods are generators and only advance state as they are consumed.
+    """
+
+    def __init__(
+        self,
+        max_words: int = CHUNK_MAX_WORDS,
+        min_words: int = CHUNK_MIN_WORDS,
+        overlap_seconds: float = CHUNK_OVERLAP_SECONDS,
+    ):
+        self.width = max(max_words, min_words, 0)
+        self.overlap_seconds = overlap_seconds
+        self.emitted = 0
+        # Words from the current window start onwards; earlier ones are dropped.
+        self._words: List[Dict] = []
+        self._last_end = 0.0
+
+    def feed(self, segments: List[Dict]) -> Iterator[Dict]:
+        for seg in segments:
+            start = float(seg.get("start", 0.0))
+            end = float(seg.get("end", start))
+            words = _segment_words_with_fallback(seg, start, end)
+            self._last_end = _shift_monotonic(words, self._last_end)
+            self._words.extend(words)
+        if self.width == 0:
+            return
+        while len(self._words) > self.width:
+            yield self._emit(self.width)
+
+    def flush(self) -> Iterator[Dict]:
+        while self._words and self.width:
+            yield self._emit(min(len(self._words), self.width))
+        self._words = []
+
+    def _emit(self, end_idx: int) -> Dict:
+        chunk = _words_chunk(self._words[:end_idx], self.emitted)
+        self.emitted += 1
+        if self.overlap_seconds > 0 and end_idx < len(self._words):
+            end_idx = _overlap_start(self._words, 0, end_idx, self.overlap_seconds)
+        del self._words[:end_idx]
+        return chunk
+
+
 def chunk_structured_transcript(structured: Dict) -> List[Dict]:
     """Chunk a structured transcript dictionary."""
     segments = structured.get("segments", [])
-    words = flatten_words(segments)
-    return chunk_words(words)
+    return chunk_word_arrays(WordArrays.from_segments(segments))
 
 
 def chunk_plaintext(text: str) -> List[Dict]:
@@ -160,7 +351,9 @@ def chunk_plaintext(text: str) -> List[Dict]:
                 "text": " ".join(span),
             }
         )
+        if end >= len(tokens):
+            break
         # Overlap by a small percentage when synthetic timestamps are absent.
         overlap = max(0, int(CHUNK_MIN_WORDS * 0.2))
-        start = end - overlap
+        start = max(start + 1, end - overlap)
     return chunks
@@ -5,9 +5,22 @@ DB_PATH = "file_index.db"
 TRANSCRIPT_FOLDER = "transcriptions"
 RECORDINGS_FOLDER = "recordings"
 EMBEDDINGS_FOLDER = "embeddings"
+# Named speaker voiceprints and the cosine similarity needed to reuse a name.
+# VOICEPRINTS_FILE is the legacy JSON store, imported into the database once.
+VOICEPRINTS_DB_PATH = "voiceprints.db"
 VOICEPRINTS_FILE = "voiceprints.json"
+VOICEPRINT_MATCH_THRESHOLD = 0.85
 OLLAMA_URL = "http://localhost:11434"
 OLLAMA_EMBED_MODEL = "mxbai-embed-large:latest"
+# Shared Ollama client: read timeouts per operation (seconds), retries for
+# transient failures, separate concurrency caps so batch jobs cannot starve
+# interactive search, and how long Ollama keeps models loaded between calls.
+OLLAMA_CONNECT_TIMEOUT = 5
+OLLAMA_TIMEOUTS = {"embed_query": 60, "embed": 300, "generate": 600}
+OLLAMA_MAX_RETRIES = 2
+OLLAMA_INTERACTIVE_CONCURRENCY = 4
+OLLAMA_BATCH_CONCURRENCY = 2
+OLLAMA_KEEP_ALIVE = "30m"
 
 # Redirect torch hub cache
 TORCH_HUB_CACHE = os.path.abspath("pipeline")
@@ -16,6 +29,57 @@ TORCH_HUB_CACHE = os.path.abspath("pipeline")
 # WhisperX model + compute type; override to pick smaller/faster or larger models.
 ASR_MODEL = "medium"
 ASR_COMPUTE_TYPE = "float32"
+# Utterances per ASR forward pass, and CPU threads for CTranslate2 and torch
+# (0 keeps the library defaults). `python autotune.py` measures the best
+# model/compute type/batch/threads for this machine and stores them in
+# settings.json, which takes precedence over these defaults.
+ASR_BATCH_SIZE = 16
+ASR_THREADS = 0
+# Upper bound on the estimated size of ASR/alignment/encoder models kept loaded;
+# least recently used models are dropped beyond it.
+MODEL_CACHE_BUDGET_MB = 8192
+# Speaker embeddings: partial utterances per encoder forward pass, and torch
+# threads for that stage (0 keeps torch's default).
+SPEAKER_EMBED_BATCH_SIZE = 64
+SPEAKER_EMBED_THREADS = 0
+# Speaker clustering: "online" (running centroids, segment order) or "offline"
+# (agglomerative over all segments), and the cosine similarity for a match.
+# "offline" is the default since the clustering rewrite; set "online" for the
+# previous segment-order behaviour (and for very long recordings on small boxes).
+SPEAKER_CLUSTERING = "offline"
+SPEAKER_CLUSTER_THRESHOLD = 0.75
+# Archive-wide index of diarized segments ("where did Alice speak?"); IVF search
+# kicks in from SPEAKER_ANN_MIN_SEGMENTS segments.
+SPEAKER_INDEX_DB_PATH = "speaker_index.db"
+SPEAKER_ANN_INDEX_PATH = "speaker_index.ivf.npz"
+SPEAKER_ANN_MIN_SEGMENTS = 50000
+# Aligned ASR output and speaker embeddings cached per audio file, so
+# re-diarizing (new clustering, voiceprints or chunking) skips the models.
+ASR_CACHE_ENABLED = True
+ASR_CACHE_DB_PATH = "asr_cache.db"
+ASR_CACHE_MAX_ENTRIES = 2000
+# Energy VAD ahead of ASR: silences longer than the `silence_seconds` setting
+# (RMS at or below `silence_threshold`) are cut, speech is padded by
+# VAD_PAD_SECONDS and regions are joined with VAD_GAP_SECONDS of silence.
+VAD_ENABLED = True
+VAD_FRAME_SECONDS = 0.03
+VAD_PAD_SECONDS = 0.5
+VAD_GAP_SECONDS = 0.3
+# Long recordings: files of at least LONG_AUDIO_MIN_SECONDS are cut at quiet
+# points (searched within LONG_AUDIO_SPLIT_WINDOW seconds of each nominal cut)
+# into ~LONG_AUDIO_SHARD_SECONDS shards, transcribed by LONG_AUDIO_WORKERS
+# processes (one on CUDA). Memory then depends on the shard length only.
+LONG_AUDIO_ENABLED = True
+LONG_AUDIO_MIN_SECONDS = 3600
+LONG_AUDIO_SHARD_SECONDS = 900
+LONG_AUDIO_SPLIT_WINDOW = 30.0
+LONG_AUDIO_WORKERS = 2
+# Two-tier transcription in the server: a draft from DRAFT_ASR_MODEL (no
+# alignment or diarization) is readable and searchable within seconds, and
+# the full pipeline replaces it in the background.
+TIERED_TRANSCRIPTION = True
+DRAFT_ASR_MODEL = "base"
+DRAFT_COMPUTE_TYPE = "int8"
 # Default language for ASR; users can still run multilingual audio.
 DEFAULT_LANGUAGE = "en"
 SUPPORTED_LANGUAGES = ["en", "es", "fr", "ja"]
@@ -23,6 +87,27 @@ SUPPORTED_LANGUAGES = ["en", "es", "fr", "ja"]
 # Embedding models (kept separate so queries and documents can diverge).
 EMBED_MODEL_DOC = "mxbai-embed-large:latest"
 EMBED_MODEL_QUERY = "mxbai-embed-large:latest"
+# Embedding backend: "ollama" (HTTP), "local" (in-process sentence-transformers)
+# or "stub" (deterministic, offline). Overridable via the embed_backend setting.
+EMBED_BACKEND = "ollama"
+LOCAL_EMBED_MODEL = "mixedbread-ai/mxbai-embed-large-v1"
+LOCAL_EMBED_DEVICE = "cpu"
+LOCAL_EMBED_ONNX = False
+STUB_EMBED_DIM = 1024
+# Document embedding: inputs per /api/embed call and batches in flight
+# (further capped by OLLAMA_BATCH_CONCURRENCY).
+EMBED_BATCH_SIZE = 32
+EMBED_CONCURRENCY = 2
+# Content-addressed chunk embedding cache (keyed by model + chunk text).
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_DB_PATH = "embedding_cache.db"
+EMBED_CACHE_MAX_ENTRIES = 500000
+
+# Query embedding cache: skip the Ollama call for recently repeated searches.
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL_SECONDS = 24 * 3600
+QUERY_CACHE_PERSIST = True
+QUERY_CACHE_DB_PATH = "query_cache.db"
 
 # Local LLMs for downstream summarisation/QA (placeholders; not yet wired to UI).
 SUMMARY_MODEL_FAST = "llama3:latest"
@@ -30,8 +115,28 @@ SUMMARY_MODEL_DEEP = "llama3:latest"
 
 # Vector index storage (per-chunk embeddings live here).
 VECTOR_DB_PATH = "vector_index.db"
+# Storage precision for chunk embeddings: float32, float16, int8 (per-vector
+# scale) or binary (sign bits in memory, float16 on disk for rescoring).
+# Run `python rebuild_index.py --requantize` after changing it.
+VECTOR_PRECISION = "float32"
+# "sqlite" keeps vectors in the embedding BLOB column; "memmap" appends them to
+# a sidecar file that every server process maps read-only (convert existing
+# data with `python rebuild_index.py --layout memmap`).
+VECTOR_STORAGE_LAYOUT = "sqlite"
+VECTOR_SIDECAR_PATH = os.path.splitext(VECTOR_DB_PATH)[0] + ".vecs"
+# Binary search rescores top_k * VECTOR_RESCORE_FACTOR Hamming candidates.
+VECTOR_RESCORE_FACTOR = 10
+# Approximate (IVF) chunk search; exact search is used below ANN_MIN_CHUNKS.
+ANN_ENABLED = True
+ANN_INDEX_PATH = os.path.splitext(VECTOR_DB_PATH)[0] + ".ivf.npz"
+ANN_MIN_CHUNKS = 50000
+# Lists probed per query: higher means better recall and slower queries.
+ANN_NPROBE = 16
 
 # Chunking heuristics for transcripts before embedding.
 CHUNK_MAX_WORDS = 220
 CHUNK_MIN_WORDS = 40
 CHUNK_OVERLAP_SECONDS = 3.0
+# Live sessions: rolling-window segments ending this long before the newest
+# audio are treated as final and chunked/embedded while recording.
+LIVE_COMMIT_LAG_SECONDS = 5.0
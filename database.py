@@ -30,12 +30,12 @@ def insert_session(timestamp, title, tags, audio_path):
     conn.commit()
     conn.close()
 
-def update_transcript(audio_path, transcript_path):
+def update_transcript(audio_path, transcript_path, diarized=True):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     c.execute(
-        "UPDATE sessions SET transcript_path=?, diarized=1 WHERE audio_path=?",
-        (transcript_path, audio_path)
+        "UPDATE sessions SET transcript_path=?, diarized=? WHERE audio_path=?",
+        (transcript_path, 1 if diarized else 0, audio_path)
     )
     updated = c.rowcount
     conn.commit()
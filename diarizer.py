@@ -1,21 +1,37 @@
+import json
 import os
 import ssl
+import tempfile
+import threading
 from pathlib import Path
 
 import certifi
 import numpy as np
-import librosa
 import torch
 import whisperx
-from resemblyzer import VoiceEncoder, preprocess_wav
+from resemblyzer import preprocess_wav, wav_to_mel_spectrogram
 
 from config import (
     TRANSCRIPT_FOLDER,
-    ASR_MODEL,
-    ASR_COMPUTE_TYPE,
     DEFAULT_LANGUAGE,
+    DRAFT_ASR_MODEL,
+    DRAFT_COMPUTE_TYPE,
+    SPEAKER_EMBED_BATCH_SIZE,
+    SPEAKER_EMBED_THREADS,
+    VAD_ENABLED,
+    LONG_AUDIO_ENABLED,
+    LONG_AUDIO_MIN_SECONDS,
+    LONG_AUDIO_WORKERS,
 )
-from voiceprints import load_voiceprints, save_voiceprints
+from asr_cache import get_asr_cache, result_key
+from audio_io import SAMPLE_RATE, StageTimer, decode_audio, probe_duration
+import settings
+from long_audio import transcribe_sharded
+from model_registry import get_registry
+from speaker_clustering import cluster_speakers
+from speaker_index import get_speaker_index
+from vad import TrimMap
+from voiceprints import get_store
 
 
 NLTK_DATA_DIR = Path(__file__).resolve().parent / "nltk_data"
@@ -23,8 +39,11 @@ NLTK_DATA_DIR.mkdir(parents=True, exist_ok=True)
 os.environ.setdefault("NLTK_DATA", str(NLTK_DATA_DIR))
 os.environ.setdefault("SSL_CERT_FILE", certifi.where())
 
-
-encoder = VoiceEncoder()
+# Structured transcripts record which pass wrote them. Drafts come from the
+# quick pass (small model, no alignment or speakers); final transcripts from the
+# full pipeline. Transcripts written before tiers existed count as final.
+TIER_DRAFT = "draft"
+TIER_FINAL = "final"
 
 
 def ensure_nltk_tokenizers():
@@ -64,142 +83,387 @@ def ensure_nltk_tokenizers():
             print(f"[warn] Unable to fetch NLTK resource '{package}'. Some diarization steps may fail: {exc}")
 
 
+def _apply_torch_threads():
+    """Use the tuned thread count (settings `asr_threads`) for torch stages."""
+    threads = settings.get_asr_threads()
+    if threads and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
 def load_pipeline(language=None, asr_model=None):
+    """ASR model with the tuned model, compute type and threads from settings.json."""
     ensure_nltk_tokenizers()
+    _apply_torch_threads()
     device = "cuda" if torch.cuda.is_available() else "cpu"
     lang = language or DEFAULT_LANGUAGE
-    model_name = asr_model or ASR_MODEL
-    model = whisperx.load_model(model_name, device, language=lang, compute_type=ASR_COMPUTE_TYPE)
+    model_name = asr_model or settings.get_asr_model()
+    model = get_registry().asr(model_name, lang, settings.get_asr_compute_type(), device)
     return model, device
 
-def transcribe_with_diarization(
-    audio_path,
-    prompt_name_mapping=False,
-    language=None,
-    asr_model=None,
-    initial_prompt=None,
-    pipeline=None,
-):
-    ensure_nltk_tokenizers()
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    lang = language or DEFAULT_LANGUAGE
-    
-    if pipeline:
-        model = pipeline
-    else:
-        model_name = asr_model or ASR_MODEL
-        model = whisperx.load_model(model_name, device, language=lang, compute_type=ASR_COMPUTE_TYPE)
-        
-    result = model.transcribe(audio_path, batch_size=16)
-    
-    # Alignment model is fast to load, but ideally should be cached too. For now, load per request.
-    align_model, metadata = whisperx.load_align_model(language_code=result["language"], device=device)
-    result = whisperx.align(result["segments"], align_model, metadata, audio_path, device, return_char_alignments=False)
-
-    wav, sr = librosa.load(audio_path, sr=16000)
-    segments = []
-    for seg in result["segments"]:
+
+def embed_segments(wavs, sr, encoder, batch_size=SPEAKER_EMBED_BATCH_SIZE, threads=SPEAKER_EMBED_THREADS):
+    """Speaker embeddings for many segments, equivalent to `encoder.embed_utterance` on each.
+
+    The fixed-length partial mel slices of every segment are stacked and run
+    through the encoder `batch_size` partials at a time instead of one forward
+    pass per segment; per-segment partials are then averaged and L2-normed as
+    resemblyzer does. Entries are None where a segment could not be embedded.
+    """
+    mels, owners = [], []
+    for idx, seg_wav in enumerate(wavs):
+        try:
+            wav = preprocess_wav(seg_wav, source_sr=sr)
+            wav_slices, mel_slices = encoder.compute_partial_slices(len(wav), rate=1.3, min_coverage=0.75)
+            if wav_slices[-1].stop >= len(wav):
+                wav = np.pad(wav, (0, wav_slices[-1].stop - len(wav)), "constant")
+            mel = wav_to_mel_spectrogram(wav)
+            mels.extend(mel[sl] for sl in mel_slices)
+            owners.extend([idx] * len(mel_slices))
+        except Exception:
+            continue
+    out = [None] * len(wavs)
+    if not mels:
+        return out
+
+    previous_threads = torch.get_num_threads()
+    if threads:
+        torch.set_num_threads(threads)
+    try:
+        stacked = np.stack(mels).astype(np.float32, copy=False)
+        partials = np.empty((len(stacked), encoder.linear.out_features), dtype=np.float32)
+        with torch.no_grad():
+            for lo in range(0, len(stacked), batch_size):
+                batch = torch.from_numpy(stacked[lo : lo + batch_size]).to(encoder.device)
+                partials[lo : lo + batch_size] = encoder(batch).cpu().numpy()
+    finally:
+        if threads:
+            torch.set_num_threads(previous_threads)
+
+    owners = np.asarray(owners)
+    bounds = np.flatnonzero(np.diff(owners)) + 1
+    for idx, block in zip(owners[np.concatenate([[0], bounds])], np.split(partials, bounds)):
+        raw = block.mean(axis=0)
+        out[idx] = raw / np.linalg.norm(raw, 2)
+    return out
+
+
+def _embed_speaker_segments(wav, sr, aligned_segments, encoder):
+    """Keep the aligned segments that lie inside `wav` and embed those long enough.
+
+    Returns (segments, embeddings): plain segment dicts and a map from segment
+    position to unit embedding. This pair is what the ASR cache stores.
+    """
+    segments, cuts = [], []
+    for seg in aligned_segments:
         s, e = int(seg["start"] * sr), int(seg["end"] * sr)
         if 0 <= s < e <= len(wav):
             segments.append(
                 {
-                    "wav": wav[s:e],
                     "text": seg.get("text", ""),
                     "start": seg.get("start", 0.0),
                     "end": seg.get("end", 0.0),
                     "words": seg.get("words", []),
                 }
             )
+            cuts.append((s, e))
+
+    long_enough = [i for i, (s, e) in enumerate(cuts) if e - s >= sr * 0.5]
+    vectors = embed_segments([wav[cuts[i][0] : cuts[i][1]] for i in long_enough], sr, encoder)
+    embeddings = {i: v for i, v in zip(long_enough, vectors) if v is not None}
+    return segments, embeddings
 
-    clusters = []
+
+def _assign_speakers(segments, embeddings, mode=None, threshold=None):
+    """Cluster the embedded segments into Speaker_N labels; the rest are Unknown.
+
+    Positions whose embedding is None (the segment could not be embedded) count
+    as unembedded, so one bad segment never fails the whole transcription.
+    """
+    embeddings = {i: v for i, v in embeddings.items() if v is not None}
+    embedded = sorted(embeddings)
     for i, seg in enumerate(segments):
-        if len(seg["wav"]) < sr * 0.5:
-            seg["speaker"] = "Unknown"
-            continue
-        try:
-            proc = preprocess_wav(seg["wav"], source_sr=sr)
-            emb = encoder.embed_utterance(proc)
-            seg["embedding"] = emb
-        except Exception:
+        if i in embeddings:
+            seg["embedding"] = embeddings[i]
+        else:
             seg["speaker"] = "Unknown"
-            continue
+    if embedded:
+        kwargs = {k: v for k, v in (("mode", mode), ("threshold", threshold)) if v is not None}
+        labels = cluster_speakers(np.stack([embeddings[i] for i in embedded]), **kwargs)
+        for i, label in zip(embedded, labels):
+            segments[i]["speaker"] = f"Speaker_{label}"
+    return segments
+
+
+def _transcribe_array(wav, model, registry, device, lang, timer, use_vad=True, label=""):
+    """VAD, ASR, alignment and speaker embeddings for one decoded 16 kHz array.
+
+    Returns (segments, embeddings, language, vad_report); segment times are on
+    the timeline of `wav`.
+    """
+    sr = SAMPLE_RATE
+    speech, vad_report = wav, None
+    if use_vad:
+        with timer.stage("vad"):
+            trim = TrimMap.detect(wav, sr, settings.get_silence_threshold(), settings.get_silence_seconds())
+            speech = trim.trim(wav)
+        vad_report = trim.summary()
+        print(
+            f"[vad] {label}: skipped {trim.skipped_seconds:.0f}s of {len(wav) / sr:.0f}s "
+            f"({100 * vad_report['skipped_share']:.0f}%) in {vad_report['regions']} speech regions"
+        )
+
+    if len(speech):
+        with timer.stage("asr"):
+            result = model.transcribe(speech, batch_size=settings.get_asr_batch_size())
+        detected = result.get("language") or lang
+
+        with timer.stage("align"):
+            align_model, metadata = registry.align(detected, device)
+            result = whisperx.align(result["segments"], align_model, metadata, speech, device, return_char_alignments=False)
+        if speech is not wav:
+            trim.map_segments(result["segments"])
+    else:
+        # Nothing above the silence threshold: no speech to transcribe.
+        detected, result = lang, {"segments": []}
+
+    with timer.stage("speakers"):
+        segments, embeddings = _embed_speaker_segments(wav, sr, result["segments"], registry.voice_encoder(device))
+    return segments, embeddings, detected, vad_report
+
+
+def _replace_text(path, text):
+    """Write `text` to `path` via a temporary file, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_session_locks = {}
+_session_locks_guard = threading.Lock()
+
+
+def _session_lock(transcript_path):
+    """Per-transcript lock ordering the draft and final writes of one session in this process."""
+    with _session_locks_guard:
+        return _session_locks.setdefault(os.path.abspath(transcript_path), threading.RLock())
+
+
+def transcript_path_for(audio_path, output_dir=None):
+    base_name = os.path.splitext(os.path.basename(audio_path))[0] + "_diarized.txt"
+    return os.path.join(output_dir or TRANSCRIPT_FOLDER, base_name)
+
+
+def _write_transcript(audio_path, output_dir, segments, name_map, language, vad_report, tier, on_written=None):
+    """Write the plain and structured transcripts for `audio_path`; returns the .txt path.
+
+    The JSON is replaced before the text file, so a reader that finds the new
+    text also finds its structured version. Writes of one session are
+    serialized; a draft is dropped (None) if a final transcript is already
+    there. `on_written(path)` runs before the next writer may start.
+    """
+    out_path = transcript_path_for(audio_path, output_dir)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
 
-        assigned = False
-        for cid, cl in enumerate(clusters):
-            coef = np.dot(emb, cl["centroid"]) / (np.linalg.norm(emb) * np.linalg.norm(cl["centroid"]))
-            if coef > 0.75:
-                seg["speaker"] = f"Speaker_{cid}"
-                cl["segments"].append(i)
-                valid_embeds = [segments[j]["embedding"] for j in cl["segments"] if "embedding" in segments[j]]
-                if valid_embeds:
-                    cl["centroid"] = np.mean(valid_embeds, axis=0)
-                assigned = True
-                break
-
-        if not assigned:
-            seg["speaker"] = f"Speaker_{len(clusters)}"
-            clusters.append({"centroid": emb, "segments": [i]})
-
-    vps = load_voiceprints()
-    name_map = {}
-
-    if prompt_name_mapping:
-        unique_speakers = {seg["speaker"] for seg in segments}
-        for spk in unique_speakers:
-            rep = next((s for s in segments if s.get("speaker") == spk and s.get("embedding") is not None), None)
-            if rep:
-                emb = rep["embedding"]
-                match = next(
-                    (
-                        info["name"]
-                        for info in vps.values()
-                        if np.dot(emb, np.array(info["embedding"]))
-                        / (np.linalg.norm(emb) * np.linalg.norm(info["embedding"]))
-                        > 0.85
-                    ),
-                    None,
-                )
-                if match:
-                    name_map[spk] = match
-
-    save_voiceprints(vps)
-
-    base_name = os.path.splitext(os.path.basename(audio_path))[0] + "_diarized"
-    out_path = os.path.join(TRANSCRIPT_FOLDER, base_name + ".txt")
-    json_path = os.path.join(TRANSCRIPT_FOLDER, base_name + ".json")
-
-    # Write plain text transcript for compatibility.
-    with open(out_path, 'w', encoding='utf-8') as f:
-        for seg in segments:
-            spk = seg.get("speaker", "Unknown")
-            nm = name_map.get(spk, spk)
-            txt = seg.get("text", "")
-            f.write(f"[{nm}] {txt}\n")
-
-    # Write structured transcript with timings and speaker mapping.
     structured = {
         "audio_path": audio_path,
-        "language": result.get("language", lang),
+        "language": language,
+        "tier": tier,
         "segments": [],
         "speaker_map": name_map,
     }
+    if vad_report:
+        structured["vad"] = vad_report
+    lines = []
     for seg in segments:
         spk = seg.get("speaker", "Unknown")
+        nm = name_map.get(spk, spk)
+        lines.append(f"[{nm}] {seg.get('text', '')}\n")
         structured["segments"].append(
             {
                 "start": float(seg.get("start", 0.0)),
                 "end": float(seg.get("end", 0.0)),
-                "speaker": name_map.get(spk, spk),
+                "speaker": nm,
                 "text": seg.get("text", ""),
                 "words": seg.get("words", []),
             }
         )
+    with _session_lock(out_path):
+        if tier == TIER_DRAFT and transcript_tier(out_path) == TIER_FINAL:
+            # The full pass finished while this draft was being transcribed.
+            return None
+        try:
+            _replace_text(os.path.splitext(out_path)[0] + ".json", json.dumps(structured, ensure_ascii=False, indent=2))
+        except Exception as exc:
+            print(f"[warn] Failed to write structured transcript: {exc}")
+        _replace_text(out_path, "".join(lines))
+        if on_written is not None:
+            on_written(out_path)
+    return out_path
+
+
+def transcript_tier(transcript_path):
+    """Tier recorded in the structured transcript next to `transcript_path`, or None if there is none."""
+    json_path = os.path.splitext(transcript_path)[0] + ".json"
+    if not os.path.exists(json_path):
+        return None
     try:
-        with open(json_path, "w", encoding="utf-8") as jf:
-            import json
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("tier") or TIER_FINAL
+    except Exception:
+        return None
+
+
+def transcribe_draft(audio_path, language=None, output_dir=None, vad=None, on_written=None):
+    """Quick readable transcript: DRAFT_ASR_MODEL, no alignment, no speakers.
+
+    Writes the same files as transcribe_with_diarization (with `"tier": "draft"`)
+    so the session can be read and searched while the full pass runs; the full
+    pass later replaces them. Returns the transcript path, or None when a final
+    transcript landed first. `on_written(path)` (e.g. recording the draft in
+    the DB) runs under the session's write lock, so a final write cannot
+    slip in between.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    lang = language or DEFAULT_LANGUAGE
+    registry = get_registry()
+    timer = StageTimer()
+    model = registry.asr(DRAFT_ASR_MODEL, lang, DRAFT_COMPUTE_TYPE, device)
+    with timer.stage("decode"):
+        wav = decode_audio(audio_path)
+    duration = len(wav) / SAMPLE_RATE
+    speech, trim, vad_report = wav, None, None
+    if VAD_ENABLED if vad is None else vad:
+        with timer.stage("vad"):
+            trim = TrimMap.detect(wav, SAMPLE_RATE, settings.get_silence_threshold(), settings.get_silence_seconds())
+            speech = trim.trim(wav)
+        vad_report = trim.summary()
+
+    detected, segments = lang, []
+    if len(speech):
+        with timer.stage("asr"):
+            result = model.transcribe(speech, batch_size=settings.get_asr_batch_size())
+        detected = result.get("language") or lang
+        segments = [
+            {"text": seg.get("text", ""), "start": seg.get("start", 0.0), "end": seg.get("end", 0.0), "speaker": "Unknown"}
+            for seg in result["segments"]
+        ]
+        if trim is not None:
+            trim.map_segments(segments)
+
+    with timer.stage("write"):
+        out_path = _write_transcript(
+            audio_path, output_dir, segments, {}, detected, vad_report, TIER_DRAFT, on_written=on_written
+        )
+    print(f"[timing] draft {os.path.basename(audio_path)}: {timer.report(duration)}")
+    return out_path
+
+
+def transcribe_with_diarization(
+    audio_path,
+    prompt_name_mapping=False,
+    language=None,
+    asr_model=None,
+    initial_prompt=None,
+    pipeline=None,
+    clustering=None,
+    cluster_threshold=None,
+    use_cache=True,
+    vad=None,
+    output_dir=None,
+    shard_workers=None,
+):
+    """Transcribe, align and diarize `audio_path`; returns the transcript path.
+
+    Aligned segments and speaker embeddings are cached per audio content,
+    model, language and compute type, so running this again (for example
+    with another `clustering` mode or `cluster_threshold`) only re-clusters
+    and rewrites the transcript.
 
-            json.dump(structured, jf, ensure_ascii=False, indent=2)
-    except Exception as exc:
-        print(f"[warn] Failed to write structured transcript: {exc}")
+    Files go to `output_dir` (default TRANSCRIPT_FOLDER) and replace any draft
+    of the same session atomically. Long recordings are sharded over
+    `shard_workers` processes (default LONG_AUDIO_WORKERS).
+    """
+    ensure_nltk_tokenizers()
+    _apply_torch_threads()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    lang = language or DEFAULT_LANGUAGE
+    model_name = asr_model or settings.get_asr_model()
+    compute_type = settings.get_asr_compute_type()
+    registry = get_registry()
+    timer = StageTimer()
+    vad_report = None
+
+    use_vad = VAD_ENABLED if vad is None else vad
+    # VAD changes which audio reaches ASR, so its parameters are part of the cache key.
+    vad_params = (
+        f"{settings.get_silence_threshold():g}/{settings.get_silence_seconds():g}" if use_vad else "off"
+    )
+    cache = get_asr_cache() if use_cache else None
+    cached = None
+    if cache is not None:
+        with timer.stage("cache"):
+            audio_hash = cache.audio_hash(audio_path)
+            key = result_key(audio_hash, model_name, lang, compute_type, vad_params)
+            cached = cache.get(key)
+
+    if cached is not None:
+        detected = cached["language"]
+        segments, embeddings = cached["segments"], cached["embeddings"]
+        duration = cached["duration"]
+        vad_report = cached["vad"]
+    else:
+        total = probe_duration(audio_path) if LONG_AUDIO_ENABLED else None
+        if total and total >= LONG_AUDIO_MIN_SECONDS:
+            segments, embeddings, detected, vad_report = transcribe_sharded(
+                audio_path,
+                model_name,
+                lang,
+                device,
+                total,
+                timer,
+                use_vad=use_vad,
+                workers=shard_workers or LONG_AUDIO_WORKERS,
+                compute_type=compute_type,
+            )
+            duration = total
+        else:
+            model = pipeline or registry.asr(model_name, lang, compute_type, device)
+            with timer.stage("decode"):
+                wav = decode_audio(audio_path)
+            duration = len(wav) / SAMPLE_RATE
+            segments, embeddings, detected, vad_report = _transcribe_array(
+                wav, model, registry, device, lang, timer, use_vad=use_vad, label=os.path.basename(audio_path)
+            )
+        if cache is not None:
+            cache.put(key, audio_hash, model_name, lang, compute_type, segments, embeddings, duration, vad_report)
+
+    with timer.stage("cluster"):
+        segments = _assign_speakers(segments, embeddings, clustering, cluster_threshold)
+
+    with timer.stage("voiceprints"):
+        name_map = {}
+        if prompt_name_mapping:
+            representatives = {}
+            for seg in segments:
+                if seg.get("embedding") is not None:
+                    representatives.setdefault(seg["speaker"], seg["embedding"])
+            name_map = get_store().match_speakers(representatives)
+
+    with timer.stage("write"):
+        out_path = _write_transcript(audio_path, output_dir, segments, name_map, detected, vad_report, TIER_FINAL)
+
+    with timer.stage("index"):
+        try:
+            named = [dict(seg, speaker=name_map.get(seg["speaker"], seg["speaker"])) for seg in segments]
+            get_speaker_index().index_session(audio_path, out_path, named)
+        except Exception as exc:
+            print(f"[warn] Failed to index speaker segments: {exc}")
 
+    print(f"[timing] {os.path.basename(audio_path)}: {timer.report(duration)}")
     return out_path
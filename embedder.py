@@ -1,15 +1,17 @@
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 
-import requests
-
+import numpy as np
 from config import (
     EMBEDDINGS_FOLDER,
-    OLLAMA_URL,
     OLLAMA_EMBED_MODEL,
     EMBED_MODEL_DOC,
     EMBED_MODEL_QUERY,
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
     TRANSCRIPT_FOLDER,
 )
 import settings
@@ -19,14 +21,98 @@ from chunker import (
     derive_structured_path,
     load_structured_transcript,
 )
-from vector_store import upsert_chunk_embeddings
+from embedding_backends import EmbeddingBackend, get_backend
+from embedding_cache import get_cache
+from vector_store import append_chunk_embeddings, upsert_chunk_embeddings
 from fts_index import upsert_doc
 
 
-def _embed_text(prompt: str, model: str) -> Optional[List[float]]:
-    resp = requests.post(f"{OLLAMA_URL}/api/embeddings", json={"model": model, "prompt": prompt})
-    resp.raise_for_status()
-    return resp.json().get("embedding")
+def _embed_text(prompt: str, model: str, backend: Optional[EmbeddingBackend] = None) -> Optional[np.ndarray]:
+    return (backend or get_backend()).embed([prompt], model)[0]
+
+
+def _embed_batch_safe(texts: List[str], model: str, backend: EmbeddingBackend) -> List[Optional[np.ndarray]]:
+    """Embed a batch; if it still fails after the client's retries, isolate the failing inputs."""
+    try:
+        return list(backend.embed(texts, model))
+    except Exception as exc:
+        print(f"[warn] Embedding batch of {len(texts)} failed: {exc}")
+    out: List[Optional[np.ndarray]] = []
+    for text in texts:
+        try:
+            out.append(_embed_text(text, model, backend))
+        except Exception as exc:
+            print(f"Embedding chunk failed: {exc}")
+            out.append(None)
+    return out
+
+
+def embed_texts(
+    texts: List[str],
+    model: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    concurrency: int = EMBED_CONCURRENCY,
+    backend: Optional[EmbeddingBackend] = None,
+) -> List[Optional[np.ndarray]]:
+    """Embed texts in batches with bounded concurrency, preserving order.
+
+    Entries that could not be embedded are None; the caller decides what to do.
+    """
+    backend = backend or get_backend()
+    if not backend.concurrent:
+        concurrency = 1
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), max(1, batch_size))]
+    if len(batches) <= 1 or concurrency <= 1:
+        results = [_embed_batch_safe(b, model, backend) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda b: _embed_batch_safe(b, model, backend), batches))
+    return [emb for batch in results for emb in batch]
+
+
+def _embed_chunks(chunks: List[Dict], model: str, backend: EmbeddingBackend, label: str) -> List[Dict]:
+    """Return copies of `chunks` carrying an "embedding", using the content cache first."""
+    if not chunks:
+        return []
+    cache_model = backend.model_id(model)
+    started = time.perf_counter()
+    texts = [ch["text"] for ch in chunks]
+    cache = get_cache()
+    embeddings = cache.get_many(cache_model, texts) if cache else [None] * len(texts)
+    missing = [i for i, emb in enumerate(embeddings) if emb is None]
+    if missing:
+        fresh = embed_texts([texts[i] for i in missing], model, backend=backend)
+        for i, emb in zip(missing, fresh):
+            embeddings[i] = emb
+        if cache:
+            cache.put_many(cache_model, [texts[i] for i in missing], fresh)
+    embedded_chunks = []
+    for ch, emb in zip(chunks, embeddings):
+        if emb is not None:
+            ch_with_emb = dict(ch)
+            ch_with_emb["embedding"] = emb
+            embedded_chunks.append(ch_with_emb)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    print(
+        f"[embed] {len(embedded_chunks)}/{len(chunks)} chunks of {label} "
+        f"in {elapsed:.1f}s ({len(embedded_chunks) / elapsed:.1f} chunks/s, "
+        f"{len(chunks) - len(missing)} from cache)"
+    )
+    if len(embedded_chunks) < len(chunks):
+        print(f"[warn] {len(chunks) - len(embedded_chunks)} chunk(s) of {label} were not embedded")
+    return embedded_chunks
+
+
+def embed_live_chunks(session_rel: str, chunks: List[Dict]) -> int:
+    """Embed chunks of a session still being recorded and append them to the vector store.
+
+    The post-recording embed of the full transcript replaces these rows.
+    Returns the number of chunks stored.
+    """
+    doc_model = settings.get_embed_model_doc() or EMBED_MODEL_DOC or OLLAMA_EMBED_MODEL
+    embedded = _embed_chunks(chunks, doc_model, get_backend(), label=session_rel)
+    append_chunk_embeddings(session_rel, embedded)
+    return len(embedded)
 
 
 def _prepare_chunks(text_file_path: str) -> Dict:
@@ -61,18 +147,9 @@ def embed_text_file(text_file_path):
         chunks = prep["chunks"]
         full_text = prep["text"]
 
-        embedded_chunks = []
         doc_model = settings.get_embed_model_doc() or EMBED_MODEL_DOC or OLLAMA_EMBED_MODEL
-        for ch in chunks:
-            try:
-                emb = _embed_text(ch["text"], doc_model)
-            except Exception as exc:
-                print(f"Embedding chunk failed: {exc}")
-                continue
-            if emb:
-                ch_with_emb = dict(ch)
-                ch_with_emb["embedding"] = emb
-                embedded_chunks.append(ch_with_emb)
+        backend = get_backend()
+        embedded_chunks = _embed_chunks(chunks, doc_model, backend, label=os.path.basename(text_file_path))
 
         # Persist chunk embeddings to the vector store for retrieval.
         try:
@@ -90,14 +167,13 @@ def embed_text_file(text_file_path):
         # Aggregate embedding (mean of chunks) for legacy consumers.
         agg_embedding = None
         if embedded_chunks:
-            import numpy as np
-
             agg_embedding = np.mean([ch["embedding"] for ch in embedded_chunks], axis=0).tolist()
         else:
             # Fallback: embed entire document if chunking failed.
             with open(text_file_path, "r", encoding="utf-8") as f:
                 content = f.read()
-            agg_embedding = _embed_text(content, doc_model)
+            agg_embedding = _embed_text(content, doc_model, backend)
+            agg_embedding = None if agg_embedding is None else agg_embedding.tolist()
 
         if not agg_embedding:
             return None
@@ -0,0 +1,141 @@
+"""Pluggable embedding backends.
+
+Every backend maps a list of texts to an (n, dim) float32 numpy matrix:
+
+- `ollama`: the local Ollama server, through the shared pooled client.
+- `local`: an in-process sentence-transformers model (optionally on ONNX
+  Runtime), loaded once per process. This skips HTTP and JSON float lists.
+- `stub`: deterministic hashed bag-of-words vectors, with no network and no
+  model. Benchmarks and offline runs use it.
+
+The backend comes from the `embed_backend` setting. Vectors from different
+backends are not comparable, so reindex (`rebuild_index.py --embed`) after
+switching.
+"""
+
+import hashlib
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+import settings
+from config import EMBED_BACKEND, LOCAL_EMBED_DEVICE, LOCAL_EMBED_MODEL, LOCAL_EMBED_ONNX, STUB_EMBED_DIM
+
+
+class EmbeddingBackend:
+    name = "base"
+    # Whether callers may run several embed() calls on this backend in parallel.
+    concurrent = True
+
+    def model_id(self, model: str) -> str:
+        """Identifier of the model actually used, for cache keys."""
+        return f"{self.name}:{model}"
+
+    def embed(self, texts: Sequence[str], model: str, priority: str = "batch") -> np.ndarray:
+        raise NotImplementedError
+
+
+class OllamaBackend(EmbeddingBackend):
+    name = "ollama"
+
+    def model_id(self, model: str) -> str:
+        # Unprefixed so caches written before backends existed stay valid.
+        return model
+
+    def embed(self, texts: Sequence[str], model: str, priority: str = "batch") -> np.ndarray:
+        from ollama_client import get_client
+
+        client = get_client()
+        if len(texts) == 1:
+            rows = [client.embed_one(texts[0], model, priority=priority, op="embed_query" if priority == "interactive" else "embed")]
+        else:
+            rows = client.embed(list(texts), model, priority=priority)
+        return np.asarray(rows, dtype=np.float32)
+
+
+class LocalBackend(EmbeddingBackend):
+    """sentence-transformers in-process; Ollama tags map to LOCAL_EMBED_MODEL."""
+
+    name = "local"
+    # One forward pass already uses all cores; parallel calls only contend.
+    concurrent = False
+
+    def __init__(self):
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _resolve(model: str) -> str:
+        # Hugging Face ids contain a slash; Ollama tags ("mxbai-embed-large:latest") do not.
+        return model if model and "/" in model else LOCAL_EMBED_MODEL
+
+    def model_id(self, model: str) -> str:
+        return f"local:{self._resolve(model)}"
+
+    def _load(self, name: str):
+        with self._lock:
+            if name not in self._models:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                except ImportError as exc:
+                    raise RuntimeError(
+                        "embed_backend 'local' needs sentence-transformers (pip install sentence-transformers)"
+                    ) from exc
+                kwargs = {"device": LOCAL_EMBED_DEVICE}
+                if LOCAL_EMBED_ONNX:
+                    kwargs["backend"] = "onnx"
+                print(f"[embed] loading {name} in-process ({'onnx' if LOCAL_EMBED_ONNX else 'torch'}, {LOCAL_EMBED_DEVICE})")
+                self._models[name] = SentenceTransformer(name, **kwargs)
+            return self._models[name]
+
+    def embed(self, texts: Sequence[str], model: str, priority: str = "batch") -> np.ndarray:
+        encoder = self._load(self._resolve(model))
+        out = encoder.encode(list(texts), batch_size=32, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(out, dtype=np.float32)
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(token.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class StubBackend(EmbeddingBackend):
+    """Deterministic vectors: the sum of hashed per-token vectors, so shared words mean similar vectors."""
+
+    name = "stub"
+
+    def __init__(self, dim: int = STUB_EMBED_DIM):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str], model: str, priority: str = "batch") -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in _TOKEN.findall((text or "").lower()):
+                out[i] += _token_vector(token, self.dim)
+            if not out[i].any():
+                out[i] = _token_vector("\0empty", self.dim)
+        return out
+
+
+BACKENDS = {"ollama": OllamaBackend, "local": LocalBackend, "stub": StubBackend}
+_instances: Dict[str, EmbeddingBackend] = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """Return the shared backend instance for `name` (default: the `embed_backend` setting)."""
+    name = (name or settings.get_embed_backend() or EMBED_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        print(f"[warn] Unknown embed_backend '{name}', using ollama")
+        name = "ollama"
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
@@ -0,0 +1,153 @@
+"""Content-addressed cache for document chunk embeddings.
+
+Entries are keyed by sha256(model, chunk text), so reindexing or editing a
+transcript only pays Ollama for chunks whose text actually changed. The table
+is bounded to EMBED_CACHE_MAX_ENTRIES rows with least-recently-used eviction.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import EMBED_CACHE_DB_PATH, EMBED_CACHE_ENABLED, EMBED_CACHE_MAX_ENTRIES
+
+# Stay under SQLite's host-parameter limit on older builds.
+_LOOKUP_BATCH = 500
+
+
+def content_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, db_path: str = EMBED_CACHE_DB_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        if not self._initialized:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    embedding BLOB,
+                    last_used REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_embeddings_used ON chunk_embeddings(last_used)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached embeddings aligned with `texts` (None for misses) and touch the hits."""
+        keys = [content_key(model, t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            try:
+                conn = self._connect()
+                unique = list(dict.fromkeys(keys))
+                for lo in range(0, len(unique), _LOOKUP_BATCH):
+                    part = unique[lo : lo + _LOOKUP_BATCH]
+                    marks = ",".join("?" * len(part))
+                    rows = conn.execute(
+                        f"SELECT key, embedding FROM chunk_embeddings WHERE key IN ({marks})", part
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32).copy()
+                    hit_keys = [k for k in part if k in found]
+                    if hit_keys:
+                        conn.execute(
+                            f"UPDATE chunk_embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                            [time.time(), *hit_keys],
+                        )
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Embedding cache lookup failed: {exc}")
+            out = [found.get(k) for k in keys]
+            hits = sum(1 for e in out if e is not None)
+            self.hits += hits
+            self.misses += len(out) - hits
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Optional[np.ndarray]]):
+        """Store the non-empty embeddings and evict the least recently used rows beyond the bound."""
+        now = time.time()
+        rows = [
+            (content_key(model, t), model, np.asarray(e, dtype=np.float32).tobytes(), now)
+            for t, e in zip(texts, embeddings)
+            if e is not None and len(e)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chunk_embeddings (key, model, embedding, last_used) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM chunk_embeddings WHERE key IN "
+                        "(SELECT key FROM chunk_embeddings ORDER BY last_used ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to store chunk embeddings in cache: {exc}")
+
+    def clear(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM chunk_embeddings")
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to clear embedding cache: {exc}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = 0
+            try:
+                conn = self._connect()
+                (size,) = conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()
+                conn.close()
+            except Exception:
+                pass
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache, or None when EMBED_CACHE_ENABLED is off."""
+    global _cache
+    if not EMBED_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = EmbeddingCache()
+    return _cache
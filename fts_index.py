@@ -1,10 +1,11 @@
 """Lightweight SQLite FTS index for transcripts."""
 
 import os
+import re
 import sqlite3
 from typing import Iterable, List, Optional
 
-from config import DB_PATH
+from config import DB_PATH, TRANSCRIPT_FOLDER
 
 
 def init_fts():
@@ -40,20 +41,39 @@ def upsert_doc(session_path: str, content: str, date: str = "", speakers: str =
     conn.close()
 
 
+def index_transcript(transcript_path: str):
+    """(Re)index one transcript file under its path relative to TRANSCRIPT_FOLDER."""
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    try:
+        rel = os.path.relpath(transcript_path, TRANSCRIPT_FOLDER)
+    except ValueError:
+        rel = transcript_path
+    parts = rel.split(os.sep)
+    upsert_doc(rel, content, date=parts[0] if len(parts) > 1 else "")
+
+
+def to_match_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query that matches any of its terms."""
+    terms = [t.replace('"', '""') for t in re.findall(r"\w+", text or "")]
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
 def search_fts(query: str, limit: int = 50, date_filter: Optional[str] = None) -> List[dict]:
+    """Return matching sessions ranked by bm25 (lower score is better)."""
     init_fts()
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     if date_filter:
         cursor = c.execute(
-            "SELECT session_path, snippet(transcript_fts, 1, '[', ']', '…', 10) as snip FROM transcript_fts WHERE content MATCH ? AND date = ? LIMIT ?",
+            "SELECT session_path, snippet(transcript_fts, 1, '[', ']', '…', 10) as snip, bm25(transcript_fts) as score FROM transcript_fts WHERE content MATCH ? AND date = ? ORDER BY score LIMIT ?",
             (query, date_filter, limit),
         )
     else:
         cursor = c.execute(
-            "SELECT session_path, snippet(transcript_fts, 1, '[', ']', '…', 10) as snip FROM transcript_fts WHERE content MATCH ? LIMIT ?",
+            "SELECT session_path, snippet(transcript_fts, 1, '[', ']', '…', 10) as snip, bm25(transcript_fts) as score FROM transcript_fts WHERE content MATCH ? ORDER BY score LIMIT ?",
             (query, limit),
         )
-    rows = [{"session_path": row[0], "snippet": row[1]} for row in cursor.fetchall()]
+    rows = [{"session_path": row[0], "snippet": row[1], "score": row[2]} for row in cursor.fetchall()]
     conn.close()
     return rows
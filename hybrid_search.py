@@ -0,0 +1,164 @@
+"""Hybrid keyword + semantic retrieval with reciprocal-rank fusion.
+
+The FTS5 (bm25) and vector searches run concurrently. Whatever has finished
+when the latency budget runs out is fused, so a busy Ollama delays only the
+semantic half and never the whole response. Each side has its own thread
+pool, and vector searches never queue: when every vector worker is still
+busy with an abandoned search, the vector side is skipped ("busy").
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+from fts_index import search_fts, to_match_query
+from vector_store import search_similar
+
+RRF_K = 60
+
+VECTOR_WORKERS = 4
+
+# Shared so abandoned (over-budget) searches finish in the background instead
+# of blocking the request that gave up on them. Keyword search is local SQLite
+# and gets its own pool, so slow embeddings can never starve it.
+_vector_executor = ThreadPoolExecutor(max_workers=VECTOR_WORKERS, thread_name_prefix="hybrid-vector")
+_keyword_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-keyword")
+_vector_slots = threading.BoundedSemaphore(VECTOR_WORKERS)
+
+
+def snippet(text: str, max_words: int = 40) -> str:
+    """Whitespace-collapsed excerpt of a chunk; shared by /search and /search/hybrid."""
+    words = (text or "").split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + " …"
+
+
+def _overlaps(a: Dict, b: Dict) -> bool:
+    return a["start"] < b["end"] and b["start"] < a["end"]
+
+
+def _vector_search(embed: Callable[[str], List[float]], prompt: str, limit: int) -> List[Dict]:
+    return search_similar(embed(prompt), top_k=limit)
+
+
+def _submit_vector(embed: Callable[[str], List[float]], prompt: str, limit: int):
+    """Start a vector search if a worker is free; None when all are busy."""
+    if not _vector_slots.acquire(blocking=False):
+        return None
+    future = _vector_executor.submit(_vector_search, embed, prompt, limit)
+    future.add_done_callback(lambda _: _vector_slots.release())
+    return future
+
+
+def _keyword_search(prompt: str, limit: int) -> List[Dict]:
+    query = to_match_query(prompt)
+    return search_fts(query, limit=limit) if query else []
+
+
+def hybrid_search(
+    prompt: str,
+    embed: Callable[[str], List[float]],
+    top_k: int = 30,
+    budget_s: float = 1.5,
+    candidates: int = 100,
+    rrf_k: int = RRF_K,
+) -> Dict:
+    """Return reciprocal-rank-fused results plus which sides made it within `budget_s`.
+
+    Each list contributes 1 / (rrf_k + rank) to an item's score. Chunks get
+    their vector rank plus the keyword rank of their session; sessions only
+    found by FTS become session-level results. Overlapping chunks of one session collapse to the
+    best-scoring one.
+    """
+    started = time.perf_counter()
+    futures = {
+        "vector": _submit_vector(embed, prompt, candidates),
+        "keyword": _keyword_executor.submit(_keyword_search, prompt, candidates),
+    }
+    wait([f for f in futures.values() if f is not None], timeout=budget_s)
+    outcome: Dict[str, Optional[List[Dict]]] = {}
+    errors: Dict[str, str] = {}
+    busy = set()
+    for name, fut in futures.items():
+        if fut is None:
+            busy.add(name)
+            outcome[name] = None
+            continue
+        if not fut.done():
+            outcome[name] = None
+            continue
+        try:
+            outcome[name] = fut.result()
+        except Exception as exc:
+            errors[name] = str(exc)
+            outcome[name] = None
+
+    chunks = outcome.get("vector") or []
+    sessions = outcome.get("keyword") or []
+    fts_rank = {row["session_path"]: rank for rank, row in enumerate(sessions, start=1)}
+    snippets = {row["session_path"]: row["snippet"] for row in sessions}
+
+    items: Dict[str, Dict] = {}
+    for rank, ch in enumerate(chunks, start=1):
+        key = f"{ch['session_path']}#{ch['chunk_id']}"
+        score = 1.0 / (rrf_k + rank)
+        if ch["session_path"] in fts_rank:
+            score += 1.0 / (rrf_k + fts_rank[ch["session_path"]])
+        items[key] = {
+            "kind": "chunk",
+            "score": score,
+            "similarity": ch["similarity"],
+            "vector_rank": rank,
+            "keyword_rank": fts_rank.get(ch["session_path"]),
+            "session_path": ch["session_path"],
+            "transcript_path": ch["session_path"],
+            "chunk_id": ch["chunk_id"],
+            "start": ch["start"],
+            "end": ch["end"],
+            "speakers": ch.get("speakers", []),
+            "text": ch.get("text", ""),
+            "snippet": snippet(ch.get("text", "")),
+        }
+    covered = {ch["session_path"] for ch in chunks}
+    for session_path, rank in fts_rank.items():
+        if session_path in covered:
+            continue
+        items[session_path] = {
+            "kind": "session",
+            "score": 1.0 / (rrf_k + rank),
+            "similarity": None,
+            "vector_rank": None,
+            "keyword_rank": rank,
+            "session_path": session_path,
+            "transcript_path": session_path,
+            "chunk_id": None,
+            "start": 0.0,
+            "end": 0.0,
+            "speakers": [],
+            "text": "",
+            "snippet": snippets.get(session_path, ""),
+        }
+
+    ranked = sorted(items.values(), key=lambda x: x["score"], reverse=True)
+    results: List[Dict] = []
+    kept_by_session: Dict[str, List[Dict]] = {}
+    for item in ranked:
+        same = kept_by_session.setdefault(item["session_path"], [])
+        if item["kind"] == "chunk" and any(_overlaps(item, other) for other in same if other["kind"] == "chunk"):
+            continue
+        same.append(item)
+        results.append(item)
+        if len(results) >= top_k:
+            break
+
+    return {
+        "results": results,
+        "sources": {
+            name: "ok" if res is not None else "error" if name in errors else "busy" if name in busy else "timeout"
+            for name, res in outcome.items()
+        },
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
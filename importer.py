@@ -46,22 +46,15 @@ def import_external_recordings(import_folder="recordings/imported"):
         audio.export(wav_path, format="wav")
 
         print(f"Transcribing with diarization: {wav_path}")
-        transcript_path = transcribe_with_diarization(
+        # Write straight into the dated folder so the speaker index records the final path.
+        transcript_target_folder = os.path.join(TRANSCRIPT_FOLDER, date_folder)
+        transcript_target = transcribe_with_diarization(
             wav_path,
             prompt_name_mapping=False,
+            output_dir=transcript_target_folder,
         )
 
-        if transcript_path:
-            # Move transcript to same subfolder
-            transcript_target_folder = os.path.join(TRANSCRIPT_FOLDER, date_folder)
-            os.makedirs(transcript_target_folder, exist_ok=True)
-            transcript_target = os.path.join(transcript_target_folder, os.path.basename(transcript_path))
-            shutil.move(transcript_path, transcript_target)
-            structured_src = os.path.splitext(transcript_path)[0] + ".json"
-            if os.path.exists(structured_src):
-                structured_tgt = os.path.splitext(transcript_target)[0] + ".json"
-                shutil.move(structured_src, structured_tgt)
-
+        if transcript_target:
             print(f"Embedding transcript: {transcript_target}")
             embedding_path = embed_text_file(transcript_target)
 
@@ -0,0 +1,216 @@
+"""Sharded transcription of long recordings.
+
+Recordings of at least LONG_AUDIO_MIN_SECONDS are cut into shards of about
+LONG_AUDIO_SHARD_SECONDS. Each cut is placed at the quietest point of a
+window around the nominal boundary, so no utterance is split. Finding a cut
+decodes only that window. Each shard is decoded by itself (ffmpeg seeks to
+it) and goes through VAD, ASR, alignment and speaker embedding in a pool of
+LONG_AUDIO_WORKERS spawned processes. Each worker loads the models once and
+gets an equal share of the CPU threads.
+
+Shard segments come back on shard-local time and are shifted onto the
+recording's timeline. Their speaker embeddings are collected so the diarizer
+can cluster speakers once over the whole recording. No process ever holds
+more than one shard of audio, so peak memory depends on the shard length,
+not on the recording length.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import settings
+from audio_io import SAMPLE_RATE, StageTimer, decode_audio
+from config import (
+    LONG_AUDIO_SHARD_SECONDS,
+    LONG_AUDIO_SPLIT_WINDOW,
+    LONG_AUDIO_WORKERS,
+    VAD_FRAME_SECONDS,
+)
+from vad import frame_rms
+
+# CPU threads of this pool worker (set by _init_worker); None outside a pool.
+_worker_threads: Optional[int] = None
+
+
+def _quietest_point(path: str, center: float, window: float) -> float:
+    """Time (s) of the quietest half second within `window` seconds of `center`."""
+    start = max(0.0, center - window)
+    audio = decode_audio(path, offset=start, duration=2 * window)
+    rms = frame_rms(audio, SAMPLE_RATE)
+    if rms.size == 0:
+        return center
+    width = max(1, int(0.5 / VAD_FRAME_SECONDS))
+    smoothed = np.convolve(rms, np.ones(width) / width, mode="same")
+    # Among equally quiet frames prefer the one nearest the nominal boundary.
+    frames = np.arange(rms.size) * VAD_FRAME_SECONDS + start
+    order = np.lexsort((np.abs(frames - center), np.round(smoothed, 6)))
+    return float(frames[order[0]])
+
+
+def plan_shards(
+    path: str,
+    total: float,
+    shard_seconds: float = LONG_AUDIO_SHARD_SECONDS,
+    window: float = LONG_AUDIO_SPLIT_WINDOW,
+) -> List[Tuple[float, float]]:
+    """(offset, duration) of each shard, cut at quiet points near every `shard_seconds`."""
+    cuts = [0.0]
+    nominal = shard_seconds
+    while nominal < total - shard_seconds / 4:
+        cut = _quietest_point(path, nominal, window)
+        if cut > cuts[-1]:
+            cuts.append(cut)
+        nominal = cuts[-1] + shard_seconds
+    cuts.append(total)
+    return [(a, b - a) for a, b in zip(cuts, cuts[1:])]
+
+
+def _init_worker(threads: int, model_name: str, language: str, compute_type: str, device: str):
+    global _worker_threads
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+        _worker_threads = threads
+    from model_registry import get_registry
+
+    get_registry().warmup(model_name, language, compute_type, device, threads=_worker_threads)
+
+
+def _shard_job(
+    path: str,
+    offset: float,
+    duration: float,
+    model_name: str,
+    language: str,
+    compute_type: str,
+    device: str,
+    use_vad: bool,
+) -> Dict:
+    """Transcribe one shard; runs in a pool worker (or in-process with one worker)."""
+    from diarizer import _transcribe_array
+    from model_registry import get_registry
+
+    registry = get_registry()
+    timer = StageTimer()
+    with timer.stage("decode"):
+        wav = decode_audio(path, offset=offset, duration=duration)
+    model = registry.asr(model_name, language, compute_type, device, _worker_threads)
+    label = f"{os.path.basename(path)}@{offset:.0f}s"
+    segments, embeddings, detected, vad_report = _transcribe_array(
+        wav, model, registry, device, language, timer, use_vad=use_vad, label=label
+    )
+    return {
+        "offset": offset,
+        "duration": len(wav) / SAMPLE_RATE,
+        "segments": segments,
+        "embeddings": embeddings,
+        "language": detected,
+        "vad": vad_report,
+        "stages": timer.as_dict(),
+    }
+
+
+def _shift(segments: List[Dict], offset: float):
+    for seg in segments:
+        for item in [seg, *(w for w in seg.get("words", []) or [] if isinstance(w, dict))]:
+            for key in ("start", "end"):
+                if item.get(key) is not None:
+                    item[key] = float(item[key]) + offset
+
+
+def stitch(results: List[Dict]) -> Tuple[List[Dict], Dict[int, np.ndarray], str, Optional[Dict]]:
+    """Concatenate shard results onto one timeline with global segment positions."""
+    segments: List[Dict] = []
+    embeddings: Dict[int, np.ndarray] = {}
+    languages: Dict[str, float] = {}
+    skipped, regions, audio = 0.0, 0, 0.0
+    has_vad = False
+    for res in sorted(results, key=lambda r: r["offset"]):
+        _shift(res["segments"], res["offset"])
+        base = len(segments)
+        segments.extend(res["segments"])
+        for i, vec in res["embeddings"].items():
+            embeddings[base + int(i)] = vec
+        languages[res["language"]] = languages.get(res["language"], 0.0) + res["duration"]
+        audio += res["duration"]
+        if res["vad"]:
+            has_vad = True
+            skipped += res["vad"]["skipped_seconds"]
+            regions += res["vad"]["regions"]
+    language = max(languages, key=languages.get) if languages else ""
+    report = None
+    if has_vad:
+        report = {
+            "regions": regions,
+            "audio_seconds": round(audio, 2),
+            "skipped_seconds": round(skipped, 2),
+            "skipped_share": round(skipped / audio, 4) if audio else 0.0,
+        }
+    return segments, embeddings, language, report
+
+
+def _workers_for(device: str, workers: int) -> int:
+    # Every worker holds its own copy of the models; on one GPU that rarely fits.
+    return 1 if device == "cuda" else max(1, workers)
+
+
+def transcribe_sharded(
+    path: str,
+    model_name: str,
+    language: str,
+    device: str,
+    total: float,
+    timer: StageTimer,
+    use_vad: bool = True,
+    workers: int = LONG_AUDIO_WORKERS,
+    shard_seconds: float = LONG_AUDIO_SHARD_SECONDS,
+    compute_type: Optional[str] = None,
+):
+    """Sharded equivalent of diarizer._transcribe_array for a file on disk.
+
+    Returns (segments, embeddings, language, vad_report) on the recording's timeline.
+    """
+    compute_type = compute_type or settings.get_asr_compute_type()
+    with timer.stage("plan"):
+        shards = plan_shards(path, total, shard_seconds)
+    workers = min(_workers_for(device, workers), len(shards))
+    print(f"[long] {os.path.basename(path)}: {total / 60:.0f} min in {len(shards)} shards, {workers} worker(s)")
+    jobs = [(path, offset, duration, model_name, language, compute_type, device, use_vad) for offset, duration in shards]
+    results = []
+    started = time.perf_counter()
+    with timer.stage("shards"):
+        if workers == 1:
+            for job in jobs:
+                results.append(_shard_job(*job))
+                _progress(path, len(results), len(jobs), started)
+        else:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(threads, model_name, language, compute_type, device),
+            ) as pool:
+                futures = [pool.submit(_shard_job, *job) for job in jobs]
+                for future in futures:
+                    results.append(future.result())
+                    _progress(path, len(results), len(jobs), started)
+    stage_totals: Dict[str, float] = {}
+    for res in results:
+        for name, sec in res["stages"].items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + sec
+    print("[long] worker time by stage: " + ", ".join(f"{k} {v:.1f}s" for k, v in stage_totals.items()))
+    with timer.stage("stitch"):
+        return stitch(results)
+
+
+def _progress(path: str, done: int, total: int, started: float):
+    elapsed = time.perf_counter() - started
+    eta = elapsed / done * (total - done)
+    print(f"[long] {os.path.basename(path)}: shard {done}/{total} done, {elapsed:.0f}s elapsed, ETA {eta:.0f}s")
@@ -0,0 +1,219 @@
+"""Process-wide cache of the heavy speech models.
+
+WhisperX ASR models are keyed by (model, language, compute_type, device,
+threads), alignment models by (language, device) and the resemblyzer voice
+encoder by device; unspecified ASR model, compute type and threads come from
+the tuned values in settings. Models load lazily, once per key, even when several threads ask at
+the same time. Least-recently-used entries are evicted when the estimated
+resident size exceeds MODEL_CACHE_BUDGET_MB. A caller that still holds an
+evicted model keeps it alive until it drops the reference.
+"""
+
+import gc
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import settings
+from config import DEFAULT_LANGUAGE, MODEL_CACHE_BUDGET_MB
+
+# Approximate parameter counts (millions) of the Whisper checkpoints; CTranslate2
+# models do not expose their size, so ASR entries are estimated from these.
+_WHISPER_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+    "turbo": 809,
+    "distil-large": 756,
+    "distil-medium": 394,
+    "distil-small": 166,
+}
+_BYTES_PER_PARAM = {"float32": 4, "float16": 2, "bfloat16": 2, "int8_float32": 1, "int8_float16": 1, "int8": 1}
+
+
+def default_device() -> str:
+    import torch
+
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def asr_params_m(model_name: str) -> int:
+    """Approximate parameter count (millions) of a Whisper checkpoint; unknown names count as medium."""
+    name = model_name.lower().split("/")[-1].removeprefix("faster-whisper-").removeprefix("whisper-")
+    return next((v for k, v in sorted(_WHISPER_PARAMS_M.items(), key=lambda kv: -len(kv[0])) if name.startswith(k)), 769)
+
+
+def _estimate_asr_bytes(model_name: str, compute_type: str) -> int:
+    return int(asr_params_m(model_name) * 1e6 * _BYTES_PER_PARAM.get(compute_type, 4))
+
+
+def _torch_bytes(model: Any) -> int:
+    """Parameter + buffer bytes of a torch module (0 when `model` is not one)."""
+    params = getattr(model, "parameters", None)
+    if params is None:
+        return 0
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    total += sum(b.numel() * b.element_size() for b in getattr(model, "buffers", lambda: [])())
+    return int(total)
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb: float = MODEL_CACHE_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        # key -> (model, estimated bytes)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, key: Hashable, loader: Callable[[], Any], size: Optional[Callable[[Any], int]] = None) -> Any:
+        """Return the model for `key`, calling `loader` once if it is not resident."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    # Loaded by another thread while we waited.
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+            started = time.perf_counter()
+            model = loader()
+            elapsed = time.perf_counter() - started
+            nbytes = size(model) if size else _torch_bytes(model)
+            print(f"[models] loaded {key} in {elapsed:.1f}s (~{nbytes / 2**20:.0f} MiB)")
+            with self._lock:
+                self._entries[key] = (model, nbytes)
+                self._loading.pop(key, None)
+                self.loads += 1
+                self.load_seconds += elapsed
+                self._evict(keep=key)
+            return model
+
+    def _evict(self, keep: Hashable):
+        evicted = False
+        while self._resident_bytes() > self.budget_bytes and len(self._entries) > 1:
+            key = next(k for k in self._entries if k != keep)
+            self._entries.pop(key)
+            self.evictions += 1
+            evicted = True
+            print(f"[models] evicted {key} (budget {self.budget_bytes / 2**20:.0f} MiB)")
+        if evicted:
+            gc.collect()
+            try:
+                import torch
+
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+    def _resident_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def asr(
+        self,
+        model_name: Optional[str] = None,
+        language: Optional[str] = None,
+        compute_type: Optional[str] = None,
+        device: Optional[str] = None,
+        threads: Optional[int] = None,
+    ):
+        model_name = model_name or settings.get_asr_model()
+        language = language or DEFAULT_LANGUAGE
+        compute_type = compute_type or settings.get_asr_compute_type()
+        device = device or default_device()
+        threads = settings.get_asr_threads() if threads is None else threads
+
+        def load():
+            import whisperx
+
+            kwargs = {"threads": threads} if threads else {}
+            return whisperx.load_model(model_name, device, language=language, compute_type=compute_type, **kwargs)
+
+        return self.get(
+            ("asr", model_name, language, compute_type, device, threads),
+            load,
+            size=lambda _: _estimate_asr_bytes(model_name, compute_type),
+        )
+
+    def align(self, language: str, device: Optional[str] = None):
+        """Return (align_model, metadata) for `language`."""
+        device = device or default_device()
+
+        def load():
+            import whisperx
+
+            return whisperx.load_align_model(language_code=language, device=device)
+
+        return self.get(("align", language, device), load, size=lambda pair: _torch_bytes(pair[0]))
+
+    def voice_encoder(self, device: Optional[str] = None):
+        device = device or default_device()
+
+        def load():
+            from resemblyzer import VoiceEncoder
+
+            return VoiceEncoder(device=device, verbose=False)
+
+        return self.get(("voice_encoder", device), load)
+
+    def warmup(
+        self,
+        asr_model: Optional[str] = None,
+        language: Optional[str] = None,
+        compute_type: Optional[str] = None,
+        device: Optional[str] = None,
+        align: bool = True,
+        encoder: bool = True,
+        threads: Optional[int] = None,
+    ):
+        """Load the models a transcription will need before the first request."""
+        self.asr(asr_model, language, compute_type, device, threads)
+        if align:
+            self.align(language or DEFAULT_LANGUAGE, device)
+        if encoder:
+            self.voice_encoder(device)
+
+    def evict(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "budget_mb": round(self.budget_bytes / 2**20, 1),
+                "resident_mb": round(self._resident_bytes() / 2**20, 1),
+                "models": [{"key": list(k), "mb": round(b / 2**20, 1)} for k, (_, b) in self._entries.items()],
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 1),
+            }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
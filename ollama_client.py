@@ -0,0 +1,170 @@
+"""Shared HTTP client for the local Ollama server.
+
+Every embedding and generation call goes through one pooled
+`requests.Session`. Each operation has its own timeout. Transient failures
+(connection errors, timeouts, 502/503/504) are retried with exponential
+backoff. Interactive traffic (search queries, on-demand summaries) and batch
+traffic (reindexing, auto-summaries) have separate concurrency limits, so a
+bulk reindex cannot starve a user waiting on search.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    OLLAMA_BATCH_CONCURRENCY,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_INTERACTIVE_CONCURRENCY,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MAX_RETRIES,
+    OLLAMA_TIMEOUTS,
+    OLLAMA_URL,
+)
+
+PRIORITIES = ("interactive", "batch")
+_RETRY_STATUS = {502, 503, 504}
+
+
+class _OpStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=512)
+
+    def snapshot(self) -> Dict:
+        recent = sorted(self.recent)
+
+        def pct(p: float) -> Optional[float]:
+            return round(recent[min(len(recent) - 1, int(p * len(recent)))], 1) if recent else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class OllamaClient:
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        interactive_limit: int = OLLAMA_INTERACTIVE_CONCURRENCY,
+        batch_limit: int = OLLAMA_BATCH_CONCURRENCY,
+        keep_alive: Optional[str] = OLLAMA_KEEP_ALIVE,
+        max_retries: int = OLLAMA_MAX_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=interactive_limit + batch_limit)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._limits = {"interactive": interactive_limit, "batch": batch_limit}
+        self._slots = {
+            "interactive": threading.BoundedSemaphore(interactive_limit),
+            "batch": threading.BoundedSemaphore(batch_limit),
+        }
+        self._stats: Dict[str, _OpStats] = {}
+        self._stats_lock = threading.Lock()
+        # Flipped off when the server predates the batch /api/embed endpoint.
+        self._batch_embed = True
+
+    def _record(self, op: str, elapsed_ms: float, ok: bool, retries: int):
+        with self._stats_lock:
+            st = self._stats.setdefault(op, _OpStats())
+            st.count += 1
+            st.retries += retries
+            if not ok:
+                st.errors += 1
+            st.total_ms += elapsed_ms
+            st.max_ms = max(st.max_ms, elapsed_ms)
+            st.recent.append(elapsed_ms)
+
+    def _post(self, op: str, path: str, payload: Dict, priority: str) -> requests.Response:
+        if priority not in self._slots:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+        if self.keep_alive is not None:
+            payload = {**payload, "keep_alive": self.keep_alive}
+        timeout = (OLLAMA_CONNECT_TIMEOUT, OLLAMA_TIMEOUTS.get(op, 300))
+        started = time.perf_counter()
+        attempt = 0
+        with self._slots[priority]:
+            while True:
+                try:
+                    resp = self.session.post(f"{self.base_url}{path}", json=payload, timeout=timeout)
+                    if resp.status_code in _RETRY_STATUS and attempt < self.max_retries:
+                        raise requests.HTTPError(f"{resp.status_code} from Ollama", response=resp)
+                    break
+                except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as exc:
+                    if attempt >= self.max_retries:
+                        self._record(op, (time.perf_counter() - started) * 1000, False, attempt)
+                        raise
+                    attempt += 1
+                    print(f"[warn] Ollama {op} failed ({exc}); retry {attempt}/{self.max_retries}")
+                    time.sleep(0.5 * 2 ** (attempt - 1))
+        self._record(op, (time.perf_counter() - started) * 1000, resp.ok, attempt)
+        return resp
+
+    def embed(self, texts: List[str], model: str, priority: str = "batch", op: str = "embed") -> List[List[float]]:
+        """Embed several inputs, using /api/embed when the server supports it."""
+        if self._batch_embed:
+            resp = self._post(op, "/api/embed", {"model": model, "input": list(texts)}, priority)
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                embeddings = resp.json().get("embeddings") or []
+                if len(embeddings) != len(texts):
+                    raise RuntimeError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs")
+                return embeddings
+            print("[warn] Ollama has no /api/embed; falling back to one request per input.")
+            self._batch_embed = False
+        out = []
+        for text in texts:
+            resp = self._post(op, "/api/embeddings", {"model": model, "prompt": text}, priority)
+            resp.raise_for_status()
+            emb = resp.json().get("embedding")
+            if not emb:
+                raise RuntimeError("No embedding returned from Ollama.")
+            out.append(emb)
+        return out
+
+    def embed_one(self, text: str, model: str, priority: str = "interactive", op: str = "embed_query") -> List[float]:
+        return self.embed([text], model, priority=priority, op=op)[0]
+
+    def generate(self, prompt: str, model: str, priority: str = "interactive", **options) -> str:
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        resp = self._post("generate", "/api/generate", payload, priority)
+        resp.raise_for_status()
+        return resp.json().get("response", "")
+
+    def metrics(self) -> Dict:
+        with self._stats_lock:
+            ops = {op: st.snapshot() for op, st in self._stats.items()}
+        return {"base_url": self.base_url, "keep_alive": self.keep_alive, "limits": dict(self._limits), "operations": ops}
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Process-wide client so all callers share the pool and the concurrency limits."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
@@ -0,0 +1,145 @@
+"""LRU + TTL cache for query embeddings.
+
+Interactive searches often repeat the same prompt (re-sorting, changing the
+threshold, paging), so the Ollama round trip is skipped for prompts seen
+recently. Entries can optionally be mirrored to a small SQLite file so the
+cache survives restarts.
+"""
+
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import QUERY_CACHE_DB_PATH, QUERY_CACHE_PERSIST, QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical cache key text: NFC, trimmed, single spaces."""
+    return " ".join(unicodedata.normalize("NFC", prompt or "").split())
+
+
+class QueryEmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = QUERY_CACHE_SIZE,
+        ttl_seconds: float = QUERY_CACHE_TTL_SECONDS,
+        db_path: Optional[str] = QUERY_CACHE_DB_PATH if QUERY_CACHE_PERSIST else None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # key -> (created wall time, embedding)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.db_path:
+            self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                model TEXT,
+                prompt TEXT,
+                embedding BLOB,
+                created REAL,
+                PRIMARY KEY (model, prompt)
+            )
+            """
+        )
+        return conn
+
+    def _load(self):
+        try:
+            conn = self._connect()
+            cutoff = time.time() - self.ttl_seconds
+            conn.execute("DELETE FROM query_embeddings WHERE created < ?", (cutoff,))
+            conn.commit()
+            rows = conn.execute(
+                "SELECT model, prompt, embedding, created FROM query_embeddings ORDER BY created DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+            conn.close()
+        except Exception as exc:
+            print(f"[warn] Failed to load query embedding cache: {exc}")
+            return
+        for model, prompt, blob, created in reversed(rows):
+            self._entries[(model, prompt)] = (created, np.frombuffer(blob, dtype=np.float32).copy())
+
+    def _persist(self, key: Tuple[str, str], created: float, embedding: np.ndarray):
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, prompt, embedding, created) VALUES (?, ?, ?, ?)",
+                (key[0], key[1], embedding.tobytes(), created),
+            )
+            # Keep the table bounded like the in-memory LRU.
+            conn.execute(
+                "DELETE FROM query_embeddings WHERE rowid NOT IN "
+                "(SELECT rowid FROM query_embeddings ORDER BY created DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+            conn.close()
+        except Exception as exc:
+            print(f"[warn] Failed to persist query embedding: {exc}")
+
+    def get(self, model: str, prompt: str) -> Optional[np.ndarray]:
+        key = (model, normalize_prompt(prompt))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].copy()
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, model: str, prompt: str, embedding):
+        key = (model, normalize_prompt(prompt))
+        created = time.time()
+        embedding = np.array(embedding, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = (created, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if self.db_path:
+            self._persist(key, created, embedding)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            try:
+                conn = self._connect()
+                conn.execute("DELETE FROM query_embeddings")
+                conn.commit()
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to clear query embedding cache: {exc}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "persistent": bool(self.db_path),
+            }
@@ -4,9 +4,10 @@
 import argparse
 import os
 
-from config import TRANSCRIPT_FOLDER
+from config import TRANSCRIPT_FOLDER, VECTOR_PRECISION
 from fts_index import upsert_doc, init_fts
 from embedder import embed_text_file
+from vector_store import LAYOUTS, PRECISIONS, compact_sidecar, convert_layout, quantization_report, requantize
 
 
 def iter_transcripts():
@@ -41,7 +42,44 @@ def rebuild(also_embed: bool = False):
 def main():
     parser = argparse.ArgumentParser(description="Rebuild local search indexes.")
     parser.add_argument("--embed", action="store_true", help="Re-embed transcripts into the vector index.")
+    parser.add_argument(
+        "--requantize",
+        nargs="?",
+        const=VECTOR_PRECISION,
+        choices=PRECISIONS,
+        help="Rewrite stored chunk embeddings at this precision (default: VECTOR_PRECISION) and exit.",
+    )
+    parser.add_argument(
+        "--precision-report",
+        action="store_true",
+        help="Print memory and recall@10 of each embedding precision and exit.",
+    )
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        help="Move stored chunk embeddings into SQLite BLOBs or the memory-mapped sidecar and exit.",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Rewrite the embedding sidecar without tombstoned rows and exit.",
+    )
     args = parser.parse_args()
+    if args.layout:
+        moved = convert_layout(args.layout)
+        print(f"[vectors] moved {moved} chunk embeddings to the {args.layout} layout")
+        return
+    if args.compact:
+        live, reclaimed = compact_sidecar()
+        print(f"[vectors] sidecar compacted: {live} live rows, {reclaimed} tombstones dropped")
+        return
+    if args.requantize:
+        converted = requantize(args.requantize)
+        print(f"[vectors] rewrote {converted} chunk embeddings as {args.requantize}")
+        return
+    if args.precision_report:
+        quantization_report()
+        return
     rebuild(also_embed=args.embed)
 
 
@@ -6,11 +6,10 @@ import uuid
 import time
 import asyncio
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-import numpy as np
-import requests
 import soundfile as sf
 import librosa
 from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
@@ -19,17 +18,40 @@ from fastapi.responses import StreamingResponse
 
 from config import (
     DB_PATH,
+    DEFAULT_LANGUAGE,
+    EMBED_BACKEND,
     EMBEDDINGS_FOLDER,
+    LIVE_COMMIT_LAG_SECONDS,
     OLLAMA_EMBED_MODEL,
-    OLLAMA_URL,
     RECORDINGS_FOLDER,
+    SPEAKER_CLUSTER_THRESHOLD,
+    TIERED_TRANSCRIPTION,
     TRANSCRIPT_FOLDER,
     SUMMARY_MODEL_FAST,
 )
 from database import init_db, insert_session, update_embedding, update_transcript, update_session_title, get_session_by_transcript
-from diarizer import transcribe_with_diarization, load_pipeline
-from embedder import embed_text_file
-from voiceprints import load_voiceprints, save_voiceprints
+from diarizer import (
+    TIER_FINAL,
+    load_pipeline,
+    transcribe_draft,
+    transcribe_with_diarization,
+    transcript_path_for,
+    transcript_tier,
+)
+from asr_cache import get_asr_cache
+from audio_io import decode_audio
+from chunker import StreamingChunker
+from embedder import embed_live_chunks, embed_text_file
+from embedding_backends import get_backend
+from fts_index import index_transcript
+from hybrid_search import hybrid_search, snippet
+from model_registry import get_registry
+from ollama_client import get_client as get_ollama
+from query_cache import QueryEmbeddingCache
+from settings import get_asr_batch_size, reload as reload_runtime_settings
+from speaker_index import get_speaker_index
+from vector_store import search_similar
+from voiceprints import get_store as get_voiceprints
 
 SETTINGS_FILE = "settings.json"
 VOCAB_FILE = "vocab.json"
@@ -73,6 +95,7 @@ def load_settings():
             "language": "en",
             "embed_model_doc": OLLAMA_EMBED_MODEL,
             "embed_model_query": OLLAMA_EMBED_MODEL,
+            "embed_backend": EMBED_BACKEND,
             "summary_model": SUMMARY_MODEL_FAST,
             "auto_embed": True,
             "auto_summarize": False,
@@ -84,21 +107,22 @@ def load_vocab():
     return load_json(VOCAB_FILE, [])
 
 
-def embed_query(prompt: str, model: Optional[str] = None):
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={"model": model or OLLAMA_EMBED_MODEL, "prompt": prompt},
-        timeout=120,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    emb = data.get("embedding")
-    if not emb:
-        raise RuntimeError("No embedding returned from Ollama.")
+query_cache = QueryEmbeddingCache()
+
+
+def embed_query(prompt: str, model: Optional[str] = None, backend: Optional[str] = None):
+    model = model or OLLAMA_EMBED_MODEL
+    embedder = get_backend(backend)
+    key = embedder.model_id(model)
+    cached = query_cache.get(key, prompt)
+    if cached is not None:
+        return cached
+    emb = embedder.embed([prompt], model, priority="interactive")[0]
+    query_cache.put(key, prompt, emb)
     return emb
 
 
-def generate_summary(text: str):
+def generate_summary(text: str, priority: str = "interactive"):
     settings = load_settings()
     model = settings.get("summary_model") or SUMMARY_MODEL_FAST
     
@@ -114,13 +138,7 @@ def generate_summary(text: str):
     """
     # Truncate to avoid context limit issues for now, though 20k chars is decent.
     
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/generate",
-        json={"model": model, "prompt": prompt, "stream": False},
-        timeout=300,
-    )
-    resp.raise_for_status()
-    return resp.json().get("response", "")
+    return get_ollama().generate(prompt, model, priority=priority)
 
 
 def maybe_embed_transcript(transcript_path: str, settings: dict) -> Optional[str]:
@@ -145,21 +163,12 @@ def maybe_summarize_transcript(transcript_path: str, settings: dict) -> Optional
         return None
     summary_path = os.path.splitext(transcript_path)[0] + ".summary.txt"
     txt = Path(transcript_path).read_text(encoding="utf-8", errors="ignore")
-    summary = generate_summary(txt)
+    summary = generate_summary(txt, priority="batch")
     with open(summary_path, "w", encoding="utf-8") as f:
         f.write(summary)
     return summary_path
 
 
-def cosine(a, b):
-    a = np.array(a)
-    b = np.array(b)
-    denom = (np.linalg.norm(a) * np.linalg.norm(b))
-    if denom == 0:
-        return 0.0
-    return float(np.dot(a, b) / denom)
-
-
 def resolve_transcript_path(session_path: str) -> Optional[str]:
     if not session_path:
         return None
@@ -185,9 +194,11 @@ def resolve_audio_for_transcript(transcript_path: str) -> Optional[str]:
 
 ensure_dirs()
 
-# Load ASR pipeline globally
+# Load ASR pipeline globally; the registry keeps it (and any other model/language
+# combination requested later) resident across requests.
 print("Loading ASR pipeline...")
 asr_pipeline, asr_device = load_pipeline()
+get_registry().warmup(language=DEFAULT_LANGUAGE, device=asr_device)
 print("ASR pipeline loaded.")
 
 @app.get("/health")
@@ -195,6 +206,16 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/models")
+def loaded_models():
+    return get_registry().stats()
+
+
+@app.get("/ollama/metrics")
+def ollama_metrics():
+    return get_ollama().metrics()
+
+
 @app.get("/settings")
 def get_settings():
     return load_settings()
@@ -205,6 +226,9 @@ def post_settings(payload: dict):
     current = load_settings()
     current.update(payload or {})
     save_json(SETTINGS_FILE, current)
+    # Chunk embedding and queries both resolve embed_backend through the settings
+    # module; refresh it so they never pick different backends.
+    reload_runtime_settings()
     return current
 
 
@@ -259,33 +283,127 @@ async def upload(file: UploadFile = File(...)):
     return {"audio_path": dest}
 
 
+def write_draft(audio_path: str, language: Optional[str], out_dir: str) -> Optional[str]:
+    """Write and index a draft transcript unless a final one is already there; returns its path.
+
+    The early tier check only avoids a wasted draft pass; transcribe_draft
+    checks again under the session lock before writing.
+    """
+    if transcript_tier(transcript_path_for(audio_path, out_dir)) == TIER_FINAL:
+        # Re-transcription: keep showing the current final transcript until the new one replaces it.
+        return None
+    def record(draft: str):
+        update_transcript(audio_path, draft, diarized=False)
+        index_transcript(draft)
+
+    try:
+        return transcribe_draft(audio_path, language=language, output_dir=out_dir, on_written=record)
+    except Exception as exc:
+        print(f"[warn] Draft transcription failed for {audio_path}: {exc}")
+        return None
+
+
+def refine_transcript(audio_path: str, language: Optional[str], out_dir: str, initial_prompt: Optional[str], settings: dict) -> dict:
+    """Full pipeline (configured model, alignment, diarization); replaces any draft in place."""
+    target = transcribe_with_diarization(
+        audio_path,
+        prompt_name_mapping=False,
+        language=language,
+        asr_model=settings.get("asr_model"),
+        initial_prompt=initial_prompt,
+        output_dir=out_dir,
+    )
+    update_transcript(audio_path, target)
+    get_speaker_index().set_transcript(audio_path, target)
+    index_transcript(target)
+    embedding_path = maybe_embed_transcript(target, settings)
+    summary_path = maybe_summarize_transcript(target, settings)
+    return {"transcript_path": target, "tier": TIER_FINAL, "embedding_path": embedding_path, "summary_path": summary_path}
+
+
+def _refine_in_background(*args):
+    try:
+        result = refine_transcript(*args)
+        print(f"Refined transcript ready: {result['transcript_path']}")
+    except Exception as exc:
+        print(f"[warn] Refine pass failed for {args[0]}: {exc}")
+
+
+# Refine passes run one at a time so they do not compete for the CPU/GPU.
+refine_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refine")
+
+
 @app.post("/transcribe")
 def transcribe(payload: dict):
+    """Transcribe an uploaded recording.
+
+    With tiered transcription (TIERED_TRANSCRIPTION, or `"tiered"` in the
+    payload) this returns as soon as a draft is written and searchable; the
+    full pass replaces it in the background, after which GET /transcripts
+    reports `"tier": "final"`.
+    """
     audio_path = payload.get("audio_path")
     if not audio_path or not os.path.exists(audio_path):
         raise HTTPException(status_code=400, detail="audio_path missing or not found")
     settings = load_settings()
     vocab_prompt = " ".join(load_vocab()) or None
-    transcript_tmp = transcribe_with_diarization(
+    language = payload.get("language") or settings.get("language")
+    date_folder = os.path.basename(os.path.dirname(audio_path))
+    out_dir = os.path.join(TRANSCRIPT_FOLDER, date_folder)
+    os.makedirs(out_dir, exist_ok=True)
+    if payload.get("tiered", TIERED_TRANSCRIPTION):
+        current = write_draft(audio_path, language, out_dir) or transcript_path_for(audio_path, out_dir)
+        if os.path.exists(current):
+            refine_pool.submit(_refine_in_background, audio_path, language, out_dir, vocab_prompt, settings)
+            return {
+                "transcript_path": current,
+                "tier": transcript_tier(current),
+                "refining": True,
+                "embedding_path": None,
+                "summary_path": None,
+            }
+    return refine_transcript(audio_path, language, out_dir, vocab_prompt, settings)
+
+
+@app.post("/transcripts/{session_path:path}/rediarize")
+def rediarize(session_path: str, payload: dict):
+    """Rebuild a transcript with new clustering settings or voiceprints, reusing cached ASR output."""
+    path = resolve_transcript_path(session_path)
+    if not path:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    audio_path = get_speaker_index().session_for_transcript(path) or resolve_audio_for_transcript(path)
+    if not audio_path or not os.path.exists(audio_path):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    settings = load_settings()
+    started = time.perf_counter()
+    written = transcribe_with_diarization(
         audio_path,
-        prompt_name_mapping=False,
+        prompt_name_mapping=bool(payload.get("prompt_name_mapping", False)),
         language=payload.get("language") or settings.get("language"),
         asr_model=settings.get("asr_model"),
-        initial_prompt=vocab_prompt,
-        pipeline=asr_pipeline,
+        clustering=payload.get("clustering"),
+        cluster_threshold=payload.get("threshold"),
+        output_dir=os.path.dirname(path),
     )
-    date_folder = os.path.basename(os.path.dirname(audio_path))
-    out_dir = os.path.join(TRANSCRIPT_FOLDER, date_folder)
-    os.makedirs(out_dir, exist_ok=True)
-    target = os.path.join(out_dir, os.path.basename(transcript_tmp))
-    os.replace(transcript_tmp, target)
-    struct_src = os.path.splitext(transcript_tmp)[0] + ".json"
-    if os.path.exists(struct_src):
-        os.replace(struct_src, os.path.splitext(target)[0] + ".json")
-    update_transcript(audio_path, target)
-    embedding_path = maybe_embed_transcript(target, settings)
-    summary_path = maybe_summarize_transcript(target, settings)
-    return {"transcript_path": target, "embedding_path": embedding_path, "summary_path": summary_path}
+    if os.path.abspath(written) != os.path.abspath(path):
+        # Transcripts named by transcribe_folder.py (<stem>.txt) keep their name.
+        os.replace(written, path)
+        struct_src = os.path.splitext(written)[0] + ".json"
+        if os.path.exists(struct_src):
+            os.replace(struct_src, os.path.splitext(path)[0] + ".json")
+        get_speaker_index().set_transcript(audio_path, path)
+    # New speaker labels or voiceprint names must reach keyword search too.
+    index_transcript(path)
+    if payload.get("reembed"):
+        settings = dict(settings, auto_embed=True)
+    embedding_path = maybe_embed_transcript(path, settings)
+    return {"transcript_path": path, "embedding_path": embedding_path, "seconds": round(time.perf_counter() - started, 2)}
+
+
+@app.get("/asr/cache")
+def asr_cache_stats():
+    cache = get_asr_cache()
+    return cache.stats() if cache else {"enabled": False}
 
 
 @app.post("/embed")
@@ -318,7 +436,7 @@ def get_transcript(session_path: str):
     session = get_session_by_transcript(path)
     title = session["title"] if session else "Untitled Session"
     
-    return {"transcript_path": path, "text": txt, "structured": structured, "title": title}
+    return {"transcript_path": path, "text": txt, "structured": structured, "title": title, "tier": transcript_tier(path)}
 
 @app.post("/sessions/{session_path:path}/rename")
 def rename_session(session_path: str, payload: dict):
@@ -340,6 +458,30 @@ def rename_session(session_path: str, payload: dict):
     return {"status": "ok", "title": new_title}
 
 
+def _rewrite_speakers(path: str, updates: Dict[str, str]) -> bool:
+    """Rename speakers in a transcript and its structured JSON; returns True if anything changed."""
+    struct_path = os.path.splitext(path)[0] + ".json"
+    with open(struct_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    changed = False
+    for seg in data.get("segments", []):
+        spk = seg.get("speaker")
+        if spk in updates:
+            seg["speaker"] = updates[spk]
+            changed = True
+    if not changed:
+        return False
+
+    with open(struct_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    # Regenerate plain text
+    lines = [f"[{seg['speaker']}] {seg['text']}" for seg in data["segments"]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return True
+
+
 @app.post("/transcripts/{session_path:path}/speakers")
 def update_speakers(session_path: str, payload: dict):
     path = resolve_transcript_path(session_path)
@@ -354,52 +496,32 @@ def update_speakers(session_path: str, payload: dict):
     if not updates:
         return {"status": "no_changes"}
 
-    # Load structured transcript
-    with open(struct_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    # Update segments
-    changed = False
-    for seg in data.get("segments", []):
-        spk = seg.get("speaker")
-        if spk in updates:
-            seg["speaker"] = updates[spk]
-            changed = True
-    
-    if changed:
-        # Save structured
-        with open(struct_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        # Regenerate plain text
-        lines = []
-        for seg in data["segments"]:
-            lines.append(f"[{seg['speaker']}] {seg['text']}")
-        new_text = "\n".join(lines)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(new_text)
-            
-        # Update voiceprints if applicable
-        # This is a simplified approach: we just rename the entry in voiceprints if it matches the old name
-        # Ideally we would track voiceprint IDs, but for now we rely on names
-        vps = load_voiceprints()
-        vp_changed = False
+    propagated = []
+    if _rewrite_speakers(path, updates):
+        # Voiceprints are matched by name, so carry the rename over to them.
+        store = get_voiceprints()
         for old_name, new_name in updates.items():
-            # Find if there's a voiceprint with the old name (or if it was a temporary ID)
-            # In diarizer.py, we might have assigned "Speaker_X".
-            # If we want to associate that embedding with "Alice", we need to find the voiceprint entry.
-            # But wait, diarizer.py saves voiceprints with keys like "voice_0", "voice_1".
-            # The "name" field inside is what matters.
-            
-            for vid, info in vps.items():
-                if info["name"] == old_name:
-                    info["name"] = new_name
-                    vp_changed = True
-        
-        if vp_changed:
-            save_voiceprints(vps)
-
-    return {"status": "ok"}
+            store.rename(old_name, new_name)
+        store.flush()
+
+        index = get_speaker_index()
+        audio = index.session_for_transcript(path)
+        if audio:
+            for old_name, new_name in updates.items():
+                index.rename(audio, old_name, new_name)
+            if payload.get("propagate"):
+                # Relabel the same voice in other sessions where it is still Speaker_N.
+                for new_name in set(updates.values()):
+                    for other, mapping in index.propagation_candidates(audio, new_name).items():
+                        other_path = index.transcript_for(other)
+                        if not other_path or not os.path.exists(os.path.splitext(other_path)[0] + ".json"):
+                            continue
+                        _rewrite_speakers(other_path, mapping)
+                        for old_name, name in mapping.items():
+                            index.rename(other, old_name, name)
+                        propagated.append({"transcript_path": other_path, "updates": mapping})
+
+    return {"status": "ok", "propagated": propagated}
 
 
 @app.post("/summarize")
@@ -450,41 +572,105 @@ def get_audio(transcript_path: str, start: float = 0.0, end: float = 0.0):
     return StreamingResponse(buf, media_type="audio/wav")
 
 
+def _chunk_hit(hit: dict, kind: str = "chunk") -> dict:
+    return {
+        "kind": kind,
+        "similarity": hit["similarity"],
+        "session_path": hit["session_path"],
+        "transcript_path": hit["session_path"],
+        "chunk_id": hit.get("chunk_id"),
+        "start": hit.get("start", 0.0),
+        "end": hit.get("end", 0.0),
+        "speakers": hit.get("speakers", []),
+        "text": hit.get("text", ""),
+        "snippet": snippet(hit.get("text", "")),
+    }
+
+
 @app.post("/search")
 def search(payload: dict):
     prompt = payload.get("prompt", "").strip()
     if not prompt:
         raise HTTPException(status_code=400, detail="prompt is required")
     threshold = float(payload.get("threshold", 0.75))
+    top_k = int(payload.get("top_k", 100))
+    group_by_session = bool(payload.get("group_by_session", False))
     settings = load_settings()
-    q_emb = embed_query(prompt, model=settings.get("embed_model_query") or OLLAMA_EMBED_MODEL)
-    matches = []
-    for root, _, files in os.walk(EMBEDDINGS_FOLDER):
-        for f in files:
-            if not f.endswith(".json"):
-                continue
-            emb_path = os.path.join(root, f)
-            try:
-                with open(emb_path, "r") as ef:
-                    emb_data = json.load(ef)
-                sim = cosine(q_emb, emb_data["embedding"])
-                if sim >= threshold:
-                    rel = os.path.relpath(emb_path, EMBEDDINGS_FOLDER)
-                    matches.append(
-                        {
-                            "kind": "file",
-                            "similarity": sim,
-                            "session_path": rel.replace(".json", ".txt"),
-                            "transcript_path": rel.replace(".json", ".txt"),
-                            "start": 0.0,
-                            "end": 0.0,
-                            "snippet": "",
-                        }
-                    )
-            except Exception as exc:
-                print(f"[warn] failed reading {emb_path}: {exc}")
-    matches.sort(key=lambda x: x["similarity"], reverse=True)
-    return {"results": matches[:100]}
+    q_emb = embed_query(
+        prompt,
+        model=settings.get("embed_model_query") or OLLAMA_EMBED_MODEL,
+    )
+    # Over-fetch when collapsing so each session can still surface its best chunk.
+    hits = search_similar(q_emb, top_k=top_k * 5 if group_by_session else top_k, session_filter=payload.get("session_path"))
+    hits = [h for h in hits if h["similarity"] >= threshold]
+    if not group_by_session:
+        return {"results": [_chunk_hit(h) for h in hits]}
+
+    sessions = {}
+    for h in hits:
+        best = sessions.get(h["session_path"])
+        if best is None:
+            best = _chunk_hit(h, kind="session")
+            best["hits"] = 0
+            sessions[h["session_path"]] = best
+        best["hits"] += 1
+    return {"results": list(sessions.values())[:top_k]}
+
+
+@app.post("/search/speaker")
+def search_speaker(payload: dict):
+    """Segments across all sessions spoken by a named speaker or by the voice of an example segment."""
+    index = get_speaker_index()
+    name = (payload.get("name") or "").strip()
+    if name:
+        query = get_voiceprints().embedding_for(name)
+        if query is None:
+            query = index.speaker_embedding(name)
+    elif payload.get("session_path"):
+        path = resolve_transcript_path(payload["session_path"])
+        audio = index.session_for_transcript(path) if path else None
+        query = index.segment_embedding(audio, float(payload.get("start", 0.0))) if audio else None
+    else:
+        raise HTTPException(status_code=400, detail="name or session_path is required")
+    if query is None:
+        raise HTTPException(status_code=404, detail="No voiceprint or indexed segments for that speaker")
+    hits = index.search(
+        query,
+        top_k=int(payload.get("top_k", 100)),
+        threshold=float(payload.get("threshold", SPEAKER_CLUSTER_THRESHOLD)),
+    )
+    return {"results": hits}
+
+
+@app.get("/search/speaker/stats")
+def search_speaker_stats():
+    return get_speaker_index().stats()
+
+
+@app.get("/search/cache")
+def search_cache_stats():
+    return query_cache.stats()
+
+
+@app.delete("/search/cache")
+def clear_search_cache():
+    query_cache.clear()
+    return query_cache.stats()
+
+
+@app.post("/search/hybrid")
+def search_hybrid(payload: dict):
+    prompt = payload.get("prompt", "").strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="prompt is required")
+    settings = load_settings()
+    model = settings.get("embed_model_query") or OLLAMA_EMBED_MODEL
+    return hybrid_search(
+        prompt,
+        embed=lambda text: embed_query(text, model=model),
+        top_k=int(payload.get("top_k", 30)),
+        budget_s=float(payload.get("budget_ms", 1500)) / 1000.0,
+    )
 
 
 @app.websocket("/ws/live")
@@ -502,7 +688,23 @@ async def websocket_endpoint(websocket: WebSocket):
     insert_session(timestamp=datetime.datetime.utcnow().isoformat(), title=f"Live Recording {session_id[:8]}", tags="live", audio_path=file_path)
     
     print(f"Started live recording: {file_path}")
-    
+
+    # Chunks of finalized speech are embedded while recording so the session is
+    # searchable early; the post-processing embed replaces them.
+    live_settings = load_settings()
+    live_embed = bool(live_settings.get("auto_embed"))
+    live_session = os.path.splitext(filename)[0] + "_diarized.txt"
+    live_chunker = StreamingChunker()
+    committed_until = 0.0
+    embed_tasks = set()
+
+    def queue_live_chunks(chunks):
+        if not chunks:
+            return
+        task = asyncio.create_task(asyncio.to_thread(embed_live_chunks, live_session, chunks))
+        embed_tasks.add(task)
+        task.add_done_callback(embed_tasks.discard)
+
     try:
         with open(file_path, "wb") as f:
             last_transcribe_time = time.time()
@@ -523,22 +725,39 @@ async def websocket_endpoint(websocket: WebSocket):
                                 duration = librosa.get_duration(path=file_path)
                                 offset = max(0, duration - 30)
                                 # Load audio segment
-                                audio, sr = librosa.load(file_path, sr=16000, offset=offset)
+                                audio = decode_audio(file_path, offset=offset)
                                 # Transcribe numpy array
-                                return asr_pipeline.transcribe(audio, batch_size=16)
+                                result = asr_pipeline.transcribe(audio, batch_size=get_asr_batch_size())
+                                return result, offset, duration
                             except Exception as e:
                                 print(f"Transcribe chunk failed: {e}")
-                                return {"segments": []}
+                                return {"segments": []}, 0.0, 0.0
                         
-                        result = await asyncio.to_thread(run_transcription)
+                        result, offset, duration = await asyncio.to_thread(run_transcription)
                         text = " ".join([seg["text"] for seg in result["segments"]])
                         await websocket.send_text(text)
+
+                        if live_embed:
+                            # Segments that ended well before the window edge will not be re-decoded differently.
+                            committed = []
+                            for seg in result["segments"]:
+                                start, end = offset + seg["start"], offset + seg["end"]
+                                if start >= committed_until and end <= duration - LIVE_COMMIT_LAG_SECONDS:
+                                    committed.append({"start": start, "end": end, "text": seg["text"], "speaker": "Live"})
+                                    committed_until = end
+                            queue_live_chunks(list(live_chunker.feed(committed)))
                     except Exception as e:
                         print(f"Live transcription error: {e}")
                 
     except WebSocketDisconnect:
         print(f"Live recording stopped: {file_path}")
         
+        if live_embed:
+            queue_live_chunks(list(live_chunker.flush()))
+            if embed_tasks:
+                # Let pending live appends land before the full embed replaces them.
+                await asyncio.gather(*embed_tasks, return_exceptions=True)
+
         # Trigger full pipeline (Diarization + optional Embedding/Summary)
         print("Starting post-processing for live recording...")
         try:
@@ -549,30 +768,19 @@ async def websocket_endpoint(websocket: WebSocket):
             # We run this in a thread to not block the server (though we are already in an async handler, 
             # but this is heavy CPU work). Ideally use a background task.
             # For now, we just run it.
+            language = settings.get("language")
+
             def run_pipeline():
-                transcript_tmp = transcribe_with_diarization(
-                    file_path,
-                    prompt_name_mapping=False,
-                    language=settings.get("language"),
-                    asr_model=settings.get("asr_model"),
-                    initial_prompt=vocab_prompt,
-                    pipeline=asr_pipeline,
-                )
-                
-                # Move/Rename transcript to correct folder
-                date_folder = os.path.basename(os.path.dirname(file_path)) # 'live'
-                # Actually we want to move it to 'transcriptions/live' or similar
-                # transcribe_with_diarization saves to TRANSCRIPT_FOLDER (transcriptions/)
-                # It returns the path.
-                
-                # Update DB with transcript path
-                update_transcript(file_path, transcript_tmp)
-                
-                # 2. Optional embed + summary
-                maybe_embed_transcript(transcript_tmp, settings)
-                maybe_summarize_transcript(transcript_tmp, settings)
-                    
-                print(f"Post-processing complete for {file_path}")
+                # transcribe_with_diarization saves to TRANSCRIPT_FOLDER (transcriptions/).
+                if TIERED_TRANSCRIPTION:
+                    # Draft now so the session is readable right away; the full
+                    # pass (with optional embed + summary) replaces it later.
+                    write_draft(file_path, language, TRANSCRIPT_FOLDER)
+                    refine_pool.submit(_refine_in_background, file_path, language, TRANSCRIPT_FOLDER, vocab_prompt, settings)
+                    print(f"Draft ready for {file_path}; refining in the background")
+                else:
+                    refine_transcript(file_path, language, TRANSCRIPT_FOLDER, vocab_prompt, settings)
+                    print(f"Post-processing complete for {file_path}")
 
             await asyncio.to_thread(run_pipeline)
             
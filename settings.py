@@ -8,8 +8,12 @@ import os
 from typing import Optional
 
 from config import (
+    ASR_BATCH_SIZE,
+    ASR_COMPUTE_TYPE,
     ASR_MODEL,
+    ASR_THREADS,
     DEFAULT_LANGUAGE,
+    EMBED_BACKEND,
     EMBED_MODEL_DOC,
     EMBED_MODEL_QUERY,
 )
@@ -19,9 +23,13 @@ SETTINGS_FILE = "settings.json"
 
 _state = {
     "asr_model": ASR_MODEL,
+    "asr_compute_type": ASR_COMPUTE_TYPE,
+    "asr_batch_size": ASR_BATCH_SIZE,
+    "asr_threads": ASR_THREADS,
     "language": DEFAULT_LANGUAGE,
     "embed_model_doc": EMBED_MODEL_DOC,
     "embed_model_query": EMBED_MODEL_QUERY,
+    "embed_backend": EMBED_BACKEND,
     "input_device": None,
     "silence_autostop": True,
     "silence_seconds": 8.0,
@@ -40,10 +48,27 @@ def _load_from_disk():
         print(f"[warn] Failed to load settings: {exc}")
 
 
+def reload():
+    """Re-read settings.json, e.g. after the server wrote it directly."""
+    _load_from_disk()
+
+
 def _save_to_disk():
+    # settings.json is shared with the server's own keys (auto_embed, summary_model, ...);
+    # merge into it rather than overwrite, and replace the file atomically.
     try:
-        with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(_state, f, indent=2)
+        data = {}
+        if os.path.exists(SETTINGS_FILE):
+            try:
+                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                data = {}
+        data.update(_state)
+        tmp_path = SETTINGS_FILE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, SETTINGS_FILE)
     except Exception as exc:
         print(f"[warn] Failed to save settings: {exc}")
 
@@ -55,7 +80,45 @@ def set_asr_model(name: str):
 
 
 def get_asr_model() -> str:
-    return _state.get("asr_model", ASR_MODEL)
+    return _state.get("asr_model") or ASR_MODEL
+
+
+def set_asr_compute_type(name: str):
+    if name:
+        _state["asr_compute_type"] = name.strip()
+        _save_to_disk()
+
+
+def get_asr_compute_type() -> str:
+    return _state.get("asr_compute_type") or ASR_COMPUTE_TYPE
+
+
+def get_asr_batch_size() -> int:
+    try:
+        return max(1, int(_state.get("asr_batch_size") or ASR_BATCH_SIZE))
+    except (TypeError, ValueError):
+        return ASR_BATCH_SIZE
+
+
+def get_asr_threads() -> int:
+    try:
+        return max(0, int(_state.get("asr_threads") or 0))
+    except (TypeError, ValueError):
+        return ASR_THREADS
+
+
+def override_asr_threads(threads: int):
+    """Use `threads` for ASR in this process only (not saved), e.g. in a worker pool."""
+    _state["asr_threads"] = max(0, int(threads))
+
+
+def set_asr_tuning(model: str, compute_type: str, batch_size: int, threads: int):
+    """Store an ASR configuration (as chosen by autotune.py) in one write."""
+    _state["asr_model"] = model.strip()
+    _state["asr_compute_type"] = compute_type.strip()
+    _state["asr_batch_size"] = int(batch_size)
+    _state["asr_threads"] = int(threads)
+    _save_to_disk()
 
 
 def set_language(code: str):
@@ -88,6 +151,16 @@ def get_embed_model_query() -> str:
     return _state.get("embed_model_query", EMBED_MODEL_QUERY)
 
 
+def set_embed_backend(name: str):
+    if name:
+        _state["embed_backend"] = name.strip().lower()
+        _save_to_disk()
+
+
+def get_embed_backend() -> str:
+    return _state.get("embed_backend", EMBED_BACKEND)
+
+
 def set_input_device(device):
     _state["input_device"] = device
     _save_to_disk()
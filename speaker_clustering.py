@@ -0,0 +1,123 @@
+"""Group per-segment speaker embeddings into speakers.
+
+Two modes:
+
+- `online`: segments are assigned in order. Each speaker keeps the running
+  sum of its members; cosine similarity to that sum equals similarity to the
+  mean. A new segment is scored against every speaker with one matrix-vector
+  product and joins the best match above the threshold, or starts a new
+  speaker. O(n * k) for n segments and k speakers.
+- `offline`: average-linkage agglomerative clustering over the full cosine
+  similarity matrix, cut at the equivalent pairwise threshold. It needs every segment up
+  front, so it suits final transcripts, and is not thrown by the order in
+  which speakers first appear.
+
+Labels are renumbered in order of first appearance, so both modes name
+speakers Speaker_0, Speaker_1, ... the same way.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+from config import SPEAKER_CLUSTER_THRESHOLD, SPEAKER_CLUSTERING
+
+MODES = ("online", "offline")
+# The condensed distance matrix is n*(n-1)/2 doubles (~1.6 GB at 20k segments);
+# past this, offline mode falls back to online.
+_OFFLINE_MAX_SEGMENTS = 20000
+
+
+def _unit(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def _first_seen(labels: np.ndarray) -> np.ndarray:
+    """Renumber labels 0, 1, ... in order of first appearance."""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(len(first))
+    return rank[inverse]
+
+
+class OnlineClusterer:
+    """Incremental speaker assignment against running cluster sums."""
+
+    def __init__(self, threshold: float = SPEAKER_CLUSTER_THRESHOLD, capacity: int = 16):
+        self.threshold = threshold
+        self._capacity = capacity
+        self._sums: Optional[np.ndarray] = None
+        self._norms = np.zeros(0, dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.k = 0
+
+    def add(self, embedding: np.ndarray) -> int:
+        """Assign one embedding; returns its cluster id."""
+        emb = _unit(embedding)
+        if self.k:
+            scores = (self._sums[: self.k] @ emb) / self._norms[: self.k]
+            best = int(np.argmax(scores))
+            if scores[best] > self.threshold:
+                self._sums[best] += emb
+                self._norms[best] = np.linalg.norm(self._sums[best])
+                self.counts[best] += 1
+                return best
+        if self._sums is None:
+            self._sums = np.zeros((self._capacity, emb.size), dtype=np.float32)
+            self._norms = np.zeros(self._capacity, dtype=np.float32)
+            self.counts = np.zeros(self._capacity, dtype=np.int64)
+        elif self.k == len(self._sums):
+            self._sums = np.concatenate([self._sums, np.zeros_like(self._sums)])
+            self._norms = np.concatenate([self._norms, np.zeros_like(self._norms)])
+            self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        self._sums[self.k] = emb
+        self._norms[self.k] = np.linalg.norm(emb)
+        self.counts[self.k] = 1
+        self.k += 1
+        return self.k - 1
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """Unit-length mean direction of each cluster."""
+        if not self.k:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._sums[: self.k] / self._norms[: self.k, None]
+
+
+def cluster_online(embeddings: np.ndarray, threshold: float = SPEAKER_CLUSTER_THRESHOLD) -> np.ndarray:
+    clusterer = OnlineClusterer(threshold)
+    return np.array([clusterer.add(e) for e in embeddings], dtype=np.int64)
+
+
+def cluster_offline(embeddings: np.ndarray, threshold: float = SPEAKER_CLUSTER_THRESHOLD) -> np.ndarray:
+    """Average-linkage clustering over the full cosine similarity matrix."""
+    n = len(embeddings)
+    if n < 2:
+        return np.zeros(n, dtype=np.int64)
+    from scipy.cluster.hierarchy import fcluster, linkage
+
+    tree = linkage(_unit(embeddings).astype(np.float64), method="average", metric="cosine")
+    # `threshold` is a segment-to-centroid similarity, as in online mode. Two
+    # members that are each s-similar to their centroid are about s**2 similar
+    # to each other, so cut the mean pairwise similarity at threshold**2.
+    labels = fcluster(tree, t=1.0 - threshold**2, criterion="distance")
+    return _first_seen(labels)
+
+
+def cluster_speakers(
+    embeddings: np.ndarray, mode: str = SPEAKER_CLUSTERING, threshold: float = SPEAKER_CLUSTER_THRESHOLD
+) -> np.ndarray:
+    """Cluster ids (0-based, in order of first appearance) for each embedding row."""
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if mode == "offline":
+        if len(embeddings) <= _OFFLINE_MAX_SEGMENTS:
+            return cluster_offline(embeddings, threshold)
+        print(f"[warn] {len(embeddings)} segments is too many for offline clustering; using online mode")
+        mode = "online"
+    if mode != "online":
+        raise ValueError(f"clustering mode must be one of {MODES}")
+    return cluster_online(embeddings, threshold)
@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+"""Archive-wide index of diarized speaker segments.
+
+Every diarized segment with a speaker embedding is stored with its session,
+start, end, speaker label and text. A session is keyed by its audio path,
+which stays put while transcripts are moved or renamed after diarization;
+callers record the final transcript path with `set_transcript`.
+
+Queries take a speaker embedding (a voiceprint, the centroid of a named
+speaker, or one example segment) and score it against a resident float16
+matrix of unit-normalized segment embeddings. Large archives go through the
+same IVF index as chunk search. Renaming a speaker updates the stored labels,
+and `propagation_candidates` finds auto-labelled speakers in other sessions
+that are the same voice, so a name can be carried across the archive without
+re-running diarization.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ann_index import IVFIndex
+from config import (
+    ANN_NPROBE,
+    SPEAKER_ANN_INDEX_PATH,
+    SPEAKER_ANN_MIN_SEGMENTS,
+    SPEAKER_CLUSTER_THRESHOLD,
+    SPEAKER_INDEX_DB_PATH,
+    TRANSCRIPT_FOLDER,
+)
+
+# Labels the diarizer assigns before anyone names a speaker; only these are
+# renamed by propagation.
+_AUTO_LABEL = re.compile(r"^Speaker_\d+$")
+
+
+def _norm_path(path: Optional[str]) -> str:
+    return os.path.abspath(path) if path else ""
+
+
+def _unit(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def init_speaker_db(db_path: str = SPEAKER_INDEX_DB_PATH):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS speaker_segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            audio_path TEXT,
+            transcript_path TEXT,
+            start REAL,
+            end REAL,
+            speaker TEXT,
+            text TEXT,
+            embedding BLOB
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_speaker_segments_audio ON speaker_segments(audio_path)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_speaker_segments_transcript ON speaker_segments(transcript_path)")
+    conn.commit()
+    conn.close()
+
+
+class SpeakerIndex:
+    """SQLite-backed segment store with a process-resident search matrix.
+
+    Exposes `size`, `dim`, `alive`, `dead`, `row_ids`, `generation` and
+    `vectors()` so an IVFIndex can be trained on it like on a ChunkIndex.
+    """
+
+    def __init__(self, db_path: str = SPEAKER_INDEX_DB_PATH, ann_path: str = SPEAKER_ANN_INDEX_PATH):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stamp = None
+        self.generation = 0
+        self.ann = IVFIndex(ann_path)
+        self._reset(0)
+
+    def _reset(self, dim: int, capacity: int = 0):
+        self.dim = dim
+        self.size = 0
+        self.dead = 0
+        self.codes = np.zeros((capacity, dim), dtype=np.float16)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.starts = np.zeros(capacity, dtype=np.float64)
+        self.ends = np.zeros(capacity, dtype=np.float64)
+        self.row_ids = np.zeros(capacity, dtype=np.int64)
+        self.audio_paths: List[str] = []
+        self.speakers: List[str] = []
+        self.texts: List[str] = []
+        self.by_session: Dict[str, List[int]] = {}
+        self.transcripts: Dict[str, str] = {}
+        self.generation += 1
+
+    def _db_stamp(self):
+        try:
+            st = os.stat(self.db_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _grow(self, needed: int):
+        capacity = len(self.row_ids)
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 1024)
+        for name in ("codes", "alive", "starts", "ends", "row_ids"):
+            old = getattr(self, name)
+            new = np.zeros((new_cap,) + old.shape[1:], dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def _append_rows(self, rows: Sequence[tuple]):
+        """Append (id, audio_path, transcript_path, start, end, speaker, text, embedding) rows."""
+        rows = [r for r in rows if r[7]]
+        if not rows:
+            return
+        vectors = _unit(np.stack([np.frombuffer(r[7], dtype=np.float32) for r in rows]))
+        if self.dim == 0:
+            self.dim = vectors.shape[1]
+            self.codes = np.zeros((len(self.row_ids), self.dim), dtype=np.float16)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"speaker embedding has {vectors.shape[1]} dims, index has {self.dim}")
+        base = self.size
+        self._grow(base + len(rows))
+        end = base + len(rows)
+        self.codes[base:end] = vectors
+        self.alive[base:end] = True
+        self.row_ids[base:end] = [r[0] for r in rows]
+        self.starts[base:end] = [r[3] for r in rows]
+        self.ends[base:end] = [r[4] for r in rows]
+        for pos, row in enumerate(rows, start=base):
+            self.audio_paths.append(row[1])
+            self.speakers.append(row[5])
+            self.texts.append(row[6])
+            self.by_session.setdefault(row[1], []).append(pos)
+            self.transcripts[row[1]] = row[2]
+        self.size = end
+
+    def _load(self):
+        init_speaker_db(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            stamp = self._db_stamp()
+            count = conn.execute("SELECT COUNT(*) FROM speaker_segments").fetchone()[0]
+            cursor = conn.execute(
+                "SELECT id, audio_path, transcript_path, start, end, speaker, text, embedding "
+                "FROM speaker_segments ORDER BY id"
+            )
+            self._reset(0, count)
+            while True:
+                batch = cursor.fetchmany(4096)
+                if not batch:
+                    break
+                self._append_rows(batch)
+        finally:
+            conn.close()
+        self._stamp = stamp
+        self._loaded = True
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded or self._db_stamp() != self._stamp:
+                self._load()
+
+    def vectors(self, positions: np.ndarray) -> np.ndarray:
+        return self.codes[np.asarray(positions, dtype=np.int64)].astype(np.float32)
+
+    def _drop_session(self, audio_path: str):
+        for pos in self.by_session.pop(audio_path, []):
+            if self.alive[pos]:
+                self.alive[pos] = False
+                self.dead += 1
+        self.transcripts.pop(audio_path, None)
+
+    def index_session(self, audio_path: str, transcript_path: Optional[str], segments: List[Dict]) -> int:
+        """Replace the stored segments of one session; returns how many were indexed.
+
+        Segments without an "embedding" (too short to embed) are skipped.
+        """
+        audio_path = _norm_path(audio_path)
+        transcript_path = _norm_path(transcript_path)
+        rows = [
+            (
+                audio_path,
+                transcript_path,
+                float(seg.get("start", 0.0)),
+                float(seg.get("end", 0.0)),
+                seg.get("speaker", "Unknown"),
+                seg.get("text", ""),
+                np.asarray(seg["embedding"], dtype=np.float32).tobytes(),
+            )
+            for seg in segments
+            if seg.get("embedding") is not None
+        ]
+        init_speaker_db(self.db_path)
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    conn.execute("DELETE FROM speaker_segments WHERE audio_path = ?", (audio_path,))
+                    first_id = None
+                    for row in rows:
+                        cur = conn.execute(
+                            "INSERT INTO speaker_segments (audio_path, transcript_path, start, end, speaker, text, embedding) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            row,
+                        )
+                        first_id = cur.lastrowid if first_id is None else first_id
+            finally:
+                conn.close()
+            if self._loaded:
+                self._drop_session(audio_path)
+                self._append_rows([(first_id + i, *row) for i, row in enumerate(rows)])
+                self._stamp = self._db_stamp()
+                if self.ann.trained and self.ann.sync(self):
+                    self.ann.save(self)
+        return len(rows)
+
+    def set_transcript(self, audio_path: str, transcript_path: str):
+        """Record where a session's transcript ended up after it was moved."""
+        audio_path, transcript_path = _norm_path(audio_path), _norm_path(transcript_path)
+        init_speaker_db(self.db_path)
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    conn.execute(
+                        "UPDATE speaker_segments SET transcript_path = ? WHERE audio_path = ?",
+                        (transcript_path, audio_path),
+                    )
+            finally:
+                conn.close()
+            if self._loaded and audio_path in self.by_session:
+                self.transcripts[audio_path] = transcript_path
+                self._stamp = self._db_stamp()
+
+    def session_for_transcript(self, transcript_path: str) -> Optional[str]:
+        """Audio path of the session whose transcript is `transcript_path`."""
+        self.ensure_loaded()
+        target = _norm_path(transcript_path)
+        with self._lock:
+            return next((a for a, t in self.transcripts.items() if t == target), None)
+
+    def rename(self, audio_path: str, old_name: str, new_name: str) -> int:
+        """Relabel one speaker within a session; returns the number of segments changed."""
+        audio_path = _norm_path(audio_path)
+        self.ensure_loaded()
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    changed = conn.execute(
+                        "UPDATE speaker_segments SET speaker = ? WHERE audio_path = ? AND speaker = ?",
+                        (new_name, audio_path, old_name),
+                    ).rowcount
+            finally:
+                conn.close()
+            for pos in self.by_session.get(audio_path, []):
+                if self.speakers[pos] == old_name:
+                    self.speakers[pos] = new_name
+            self._stamp = self._db_stamp()
+            return changed
+
+    def speaker_embedding(self, name: str, audio_path: Optional[str] = None) -> Optional[np.ndarray]:
+        """Mean direction of the segments labelled `name` (in one session, or everywhere)."""
+        self.ensure_loaded()
+        with self._lock:
+            if audio_path is not None:
+                positions = self.by_session.get(_norm_path(audio_path), [])
+            else:
+                positions = range(self.size)
+            picked = [p for p in positions if self.alive[p] and self.speakers[p] == name]
+            if not picked:
+                return None
+            return _unit(self.vectors(np.asarray(picked)).sum(axis=0))[0]
+
+    def segment_embedding(self, audio_path: str, start: float) -> Optional[np.ndarray]:
+        """Embedding of the segment of `audio_path` that covers (or starts closest to) `start`."""
+        self.ensure_loaded()
+        with self._lock:
+            positions = [p for p in self.by_session.get(_norm_path(audio_path), []) if self.alive[p]]
+            if not positions:
+                return None
+            positions = np.asarray(positions)
+            covering = positions[(self.starts[positions] <= start) & (self.ends[positions] >= start)]
+            pos = covering[0] if covering.size else positions[np.argmin(np.abs(self.starts[positions] - start))]
+            return self.vectors(np.asarray([pos]))[0]
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: Optional[int] = 50,
+        threshold: float = SPEAKER_CLUSTER_THRESHOLD,
+        exclude_session: Optional[str] = None,
+        nprobe: int = ANN_NPROBE,
+        ann_min_segments: int = SPEAKER_ANN_MIN_SEGMENTS,
+    ) -> List[Dict]:
+        """Segments whose voice matches `query` above `threshold`, best first.
+
+        With `top_k=None` every match is returned (exact scan). Otherwise the
+        IVF index narrows the candidates once the archive holds at least
+        `ann_min_segments` segments.
+        """
+        self.ensure_loaded()
+        query = _unit(query)[0]
+        with self._lock:
+            if self.size == 0:
+                return []
+            if query.size != self.dim:
+                raise ValueError(f"Query dim {query.size} does not match index dim {self.dim}")
+            positions = None
+            if top_k and self.size - self.dead >= ann_min_segments:
+                self.ann.ensure_ready(self)
+                positions = self.ann.candidates(self, query, nprobe)
+                if positions.size < top_k:
+                    positions = None
+            if positions is None:
+                # Exact: score contiguous blocks, then keep the live rows.
+                scores = np.empty(self.size, dtype=np.float32)
+                for lo in range(0, self.size, 65536):
+                    hi = min(self.size, lo + 65536)
+                    scores[lo:hi] = self.codes[lo:hi].astype(np.float32) @ query
+                positions = np.flatnonzero(self.alive[: self.size])
+                scores = scores[positions]
+            else:
+                scores = self.codes[positions].astype(np.float32) @ query
+            if exclude_session:
+                keep = np.ones(self.size, dtype=bool)
+                keep[self.by_session.get(_norm_path(exclude_session), [])] = False
+                scores, positions = scores[keep[positions]], positions[keep[positions]]
+            if positions.size == 0:
+                return []
+            keep = np.flatnonzero(scores > threshold)
+            keep = keep[np.argsort(-scores[keep], kind="stable")]
+            if top_k:
+                keep = keep[:top_k]
+            return [self._result(int(positions[i]), float(scores[i])) for i in keep]
+
+    def _result(self, pos: int, similarity: float) -> Dict:
+        audio_path = self.audio_paths[pos]
+        transcript = self.transcripts.get(audio_path, "")
+        try:
+            session_path = os.path.relpath(transcript, TRANSCRIPT_FOLDER) if transcript else ""
+        except ValueError:
+            session_path = transcript
+        return {
+            "similarity": similarity,
+            "session_path": session_path,
+            "audio_path": audio_path,
+            "start": float(self.starts[pos]),
+            "end": float(self.ends[pos]),
+            "speaker": self.speakers[pos],
+            "text": self.texts[pos],
+        }
+
+    def propagation_candidates(
+        self, audio_path: str, name: str, threshold: float = SPEAKER_CLUSTER_THRESHOLD, min_share: float = 0.5
+    ) -> Dict[str, Dict[str, str]]:
+        """Auto-labelled speakers in other sessions that sound like `name` in `audio_path`.
+
+        Returns {other_audio_path: {"Speaker_N": name}} for every label where at
+        least `min_share` of its segments match the named speaker's centroid.
+        """
+        centroid = self.speaker_embedding(name, audio_path)
+        if centroid is None:
+            return {}
+        hits = self.search(centroid, top_k=None, threshold=threshold, exclude_session=audio_path)
+        matched: Dict[tuple, int] = {}
+        for hit in hits:
+            if _AUTO_LABEL.match(hit["speaker"]):
+                key = (hit["audio_path"], hit["speaker"])
+                matched[key] = matched.get(key, 0) + 1
+        out: Dict[str, Dict[str, str]] = {}
+        with self._lock:
+            for (other, label), count in matched.items():
+                total = sum(1 for p in self.by_session.get(other, []) if self.alive[p] and self.speakers[p] == label)
+                if total and count / total >= min_share:
+                    out.setdefault(other, {})[label] = name
+        return out
+
+    def transcript_for(self, audio_path: str) -> Optional[str]:
+        self.ensure_loaded()
+        with self._lock:
+            return self.transcripts.get(_norm_path(audio_path)) or None
+
+    def stats(self) -> Dict:
+        self.ensure_loaded()
+        with self._lock:
+            return {
+                "segments": int(self.size - self.dead),
+                "sessions": len(self.by_session),
+                "dim": self.dim,
+                "resident_mb": round(self.codes[: self.size].nbytes / 2**20, 1),
+                "ann_lists": self.ann.nlist,
+            }
+
+
+_index: Optional[SpeakerIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_speaker_index() -> SpeakerIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SpeakerIndex()
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find where a speaker talks across all diarized sessions.")
+    parser.add_argument("--name", help="Voiceprint or speaker name to look for.")
+    parser.add_argument("--audio", help="Audio path of an example segment (use with --start).")
+    parser.add_argument("--start", type=float, default=0.0, help="Time (s) inside the example segment.")
+    parser.add_argument("-k", type=int, default=20, help="Number of segments to print.")
+    parser.add_argument("--threshold", type=float, default=SPEAKER_CLUSTER_THRESHOLD)
+    args = parser.parse_args()
+
+    index = get_speaker_index()
+    started = time.perf_counter()
+    if args.name:
+        from voiceprints import get_store
+
+        query = get_store().embedding_for(args.name)
+        if query is None:
+            query = index.speaker_embedding(args.name)
+    elif args.audio:
+        query = index.segment_embedding(args.audio, args.start)
+    else:
+        parser.print_help()
+        return
+    if query is None:
+        raise SystemExit("No voiceprint or indexed segments for that speaker.")
+    hits = index.search(query, top_k=args.k, threshold=args.threshold)
+    print(f"{len(hits)} segments in {(time.perf_counter() - started) * 1000:.1f} ms ({index.stats()['segments']} indexed)")
+    for hit in hits:
+        print(f"{hit['similarity']:.3f}  {hit['session_path'] or hit['audio_path']}  {hit['start']:8.1f}-{hit['end']:<8.1f} [{hit['speaker']}] {hit['text'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
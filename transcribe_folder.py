@@ -1,14 +1,27 @@
 #!/usr/bin/env python
-"""Batch diarization/transcription for WAV files inside a folder."""
+"""Batch diarization/transcription for WAV files inside a folder.
+
+With --workers N the files are spread over N spawned processes. Each one
+loads the models once and pulls the next file from the pool's shared queue,
+using an equal share of the CPU threads. Renaming transcripts and updating
+the sessions DB happen only in this (parent) process, one file at a time.
+"""
 
 import argparse
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional, Tuple
 
+import settings
 from config import RECORDINGS_FOLDER, TRANSCRIPT_FOLDER
 from database import init_db, update_transcript
 from diarizer import transcribe_with_diarization
+from model_registry import get_registry
+from speaker_clustering import MODES
+from speaker_index import get_speaker_index
 
 
 PROJECT_ROOT = Path(__file__).resolve().parent
@@ -48,6 +61,53 @@ def update_session(audio_path: Path, transcript_path: Path) -> bool:
     return False
 
 
+def _init_worker(threads: int):
+    if threads:
+        settings.override_asr_threads(threads)
+    # Load models once per worker; every file this worker pulls reuses them.
+    get_registry().warmup()
+
+
+def _transcribe_job(
+    wav_path: str, target_dir: str, clustering: Optional[str], threshold: Optional[float], shard_workers: Optional[int]
+) -> Tuple[str, Optional[str], Optional[str]]:
+    """Transcribe one file into `target_dir`; returns (wav_path, transcript_path, error)."""
+    try:
+        transcript = transcribe_with_diarization(
+            wav_path,
+            clustering=clustering,
+            cluster_threshold=threshold,
+            output_dir=target_dir,
+            shard_workers=shard_workers,
+        )
+        return wav_path, transcript, None
+    except Exception as exc:
+        return wav_path, None, str(exc)
+
+
+def finalize(wav_path: Path, transcript_tmp: str, final_path: Path):
+    """Move the transcript (and its structured JSON) to `final_path` and record it."""
+    temp_path = (PROJECT_ROOT / transcript_tmp).resolve()
+    final_path.parent.mkdir(parents=True, exist_ok=True)
+    if temp_path != final_path:
+        os.replace(str(temp_path), str(final_path))
+    # Move structured JSON alongside the transcript if present.
+    temp_json = temp_path.with_suffix(".json")
+    if temp_json.exists() and temp_json != final_path.with_suffix(".json"):
+        os.replace(str(temp_json), str(final_path.with_suffix(".json")))
+
+    get_speaker_index().set_transcript(str(wav_path), str(final_path))
+    db_updated = update_session(wav_path, final_path)
+    status = "updated DB" if db_updated else "no DB entry"
+    print(f"[ok] Saved transcript to {final_path} ({status})")
+
+
+def _progress(done: int, total: int, done_bytes: int, total_bytes: int, started: float):
+    elapsed = time.perf_counter() - started
+    eta = elapsed / done_bytes * (total_bytes - done_bytes) if done_bytes else 0.0
+    print(f"[progress] {done}/{total} files, {elapsed:.0f}s elapsed, ETA {eta:.0f}s")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Create diarized transcripts for WAV files inside a folder."
@@ -64,7 +124,31 @@ def main():
     parser.add_argument(
         "--overwrite",
         action="store_true",
-        help="Recreate transcripts even if they already exist.",
+        help="Recreate transcripts even if they already exist (cached ASR output is reused).",
+    )
+    parser.add_argument(
+        "--clustering",
+        choices=MODES,
+        default=None,
+        help="Speaker clustering mode (default: SPEAKER_CLUSTERING in config.py).",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Speaker clustering similarity threshold (default: SPEAKER_CLUSTER_THRESHOLD).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Transcribe this many files in parallel, each in its own process with its own models.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="CPU threads per worker (default: cores divided by --workers).",
     )
     args = parser.parse_args()
 
@@ -81,48 +165,65 @@ def main():
         return
 
     print(f"Found {len(wav_files)} WAV file(s) under {input_dir}")
+    jobs = []
     for wav_path in wav_files:
         relative = wav_path.relative_to(input_dir)
         target_dir = TRANSCRIPTS_ROOT / relative.parent
         target_dir.mkdir(parents=True, exist_ok=True)
         final_path = target_dir / f"{wav_path.stem}.txt"
-        final_path_abs = final_path.resolve()
 
         if final_path.exists() and not args.overwrite:
             print(f"[skip] {wav_path} -> transcript already exists")
             continue
+        jobs.append((wav_path, target_dir, final_path.resolve()))
+    if not jobs:
+        return
 
-        print(f"[transcribe] {wav_path}")
-        try:
-            transcript_tmp = transcribe_with_diarization(
-                str(wav_path),
-            )
-        except Exception as exc:
-            print(f"[error] Failed to transcribe {wav_path}: {exc}")
-            continue
-
-        if not transcript_tmp:
+    workers = max(1, min(args.workers, len(jobs)))
+    final_paths = {str(wav): (wav, final) for wav, _, final in jobs}
+    sizes = {str(wav): wav.stat().st_size for wav, _, _ in jobs}
+    total_bytes, done_bytes, done = sum(sizes.values()), 0, 0
+    started = time.perf_counter()
+
+    def handle(result):
+        nonlocal done, done_bytes
+        wav_str, transcript_tmp, error = result
+        wav_path, final_path = final_paths[wav_str]
+        done += 1
+        done_bytes += sizes[wav_str]
+        if error:
+            print(f"[error] Failed to transcribe {wav_path}: {error}")
+        elif not transcript_tmp:
             print(f"[warn] Diarization did not produce a transcript for {wav_path}")
-            continue
+        else:
+            finalize(wav_path, transcript_tmp, final_path)
+        _progress(done, len(jobs), done_bytes, total_bytes, started)
+
+    if workers == 1:
+        # Load models once up front; every file below reuses them from the registry.
+        if args.threads:
+            settings.override_asr_threads(args.threads)
+        get_registry().warmup()
+        for wav_path, target_dir, _ in jobs:
+            print(f"[transcribe] {wav_path}")
+            handle(_transcribe_job(str(wav_path), str(target_dir), args.clustering, args.threshold, None))
+        return
 
-        temp_path = (PROJECT_ROOT / transcript_tmp).resolve()
-        final_path_abs.parent.mkdir(parents=True, exist_ok=True)
-        if temp_path != final_path_abs:
-            if final_path_abs.exists():
-                final_path_abs.unlink()
-            os.replace(str(temp_path), str(final_path_abs))
-        # Move structured JSON alongside the transcript if present.
-        temp_json = temp_path.with_suffix(".json")
-        final_json = final_path_abs.with_suffix(".json")
-        if temp_json.exists():
-            final_json.parent.mkdir(parents=True, exist_ok=True)
-            if final_json.exists():
-                final_json.unlink()
-            os.replace(str(temp_json), str(final_json))
-
-        db_updated = update_session(wav_path, final_path_abs)
-        status = "updated DB" if db_updated else "no DB entry"
-        print(f"[ok] Saved transcript to {final_path_abs} ({status})")
+    threads = args.threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"[pool] {workers} workers x {threads} threads")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads,),
+    ) as pool:
+        # Long recordings are sharded inside their worker, not over a nested pool.
+        futures = [
+            pool.submit(_transcribe_job, str(wav_path), str(target_dir), args.clustering, args.threshold, 1)
+            for wav_path, target_dir, _ in jobs
+        ]
+        for future in as_completed(futures):
+            handle(future.result())
 
 
 if __name__ == "__main__":
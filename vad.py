@@ -0,0 +1,149 @@
+"""Energy-based speech detection used to skip dead air before ASR.
+
+Frame RMS is computed in one vectorized pass. Stretches where the RMS stays
+at or below the silence threshold for at least `min_silence` seconds are
+cut; shorter pauses stay inside speech. The kept regions are padded,
+concatenated with a short silent gap between them, and transcribed as one
+shorter array. `TrimMap` converts timestamps on that array back to the
+original recording.
+
+The threshold and minimum silence are the same `silence_threshold` and
+`silence_seconds` settings that drive recording autostop.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config import VAD_FRAME_SECONDS, VAD_GAP_SECONDS, VAD_PAD_SECONDS
+
+
+def frame_rms(wav: np.ndarray, sr: int, frame_seconds: float = VAD_FRAME_SECONDS) -> np.ndarray:
+    hop = max(1, int(sr * frame_seconds))
+    n = len(wav) // hop
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(wav[: n * hop], dtype=np.float32).reshape(n, hop)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames) / hop)
+
+
+def speech_regions(
+    wav: np.ndarray,
+    sr: int,
+    threshold: float,
+    min_silence: float,
+    pad: float = VAD_PAD_SECONDS,
+    frame_seconds: float = VAD_FRAME_SECONDS,
+) -> List[Tuple[int, int]]:
+    """Sample ranges [start, end) to keep; everything else is silence of at least `min_silence`."""
+    if len(wav) == 0:
+        return []
+    hop = max(1, int(sr * frame_seconds))
+    rms = frame_rms(wav, sr, frame_seconds)
+    if rms.size == 0 or min_silence <= 0:
+        return [(0, len(wav))]
+    silent = rms <= threshold
+    # Run boundaries of the silent mask: starts and ends of each silent stretch.
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts) * hop >= min_silence * sr
+    cuts = np.stack([run_starts[long_runs], run_ends[long_runs]], axis=1) * hop
+    if len(cuts) and cuts[-1, 1] >= rms.size * hop:
+        # Trailing partial frame belongs to the final silence.
+        cuts[-1, 1] = len(wav)
+    pad_samples = int(pad * sr)
+    regions, cursor = [], 0
+    for cut_start, cut_end in cuts:
+        if cut_start > cursor:
+            regions.append((cursor, int(cut_start)))
+        cursor = int(cut_end)
+    if cursor < len(wav):
+        regions.append((cursor, len(wav)))
+    padded = []
+    for start, end in regions:
+        start, end = max(0, start - pad_samples), min(len(wav), end + pad_samples)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+class TrimMap:
+    """Maps times on the concatenated speech regions back to the original audio."""
+
+    def __init__(self, regions: Sequence[Tuple[int, int]], sr: int, total_samples: int, gap: float = VAD_GAP_SECONDS):
+        self.sr = sr
+        self.total_samples = total_samples
+        self.gap_samples = int(gap * sr)
+        self.regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+        lengths = self.regions[:, 1] - self.regions[:, 0]
+        # Where each region starts in the trimmed array (regions are separated by gaps).
+        self.trimmed_starts = np.concatenate([[0], np.cumsum(lengths + self.gap_samples)[:-1]]).astype(np.int64)
+        self.lengths = lengths
+
+    @classmethod
+    def detect(cls, wav: np.ndarray, sr: int, threshold: float, min_silence: float) -> "TrimMap":
+        return cls(speech_regions(wav, sr, threshold, min_silence), sr, len(wav))
+
+    @property
+    def kept_seconds(self) -> float:
+        return float(self.lengths.sum()) / self.sr
+
+    @property
+    def skipped_seconds(self) -> float:
+        return (self.total_samples - float(self.lengths.sum())) / self.sr
+
+    @property
+    def is_identity(self) -> bool:
+        return len(self.regions) == 1 and self.regions[0, 0] == 0 and self.regions[0, 1] == self.total_samples
+
+    def trim(self, wav: np.ndarray) -> np.ndarray:
+        if self.is_identity:
+            return wav
+        gap = np.zeros(self.gap_samples, dtype=wav.dtype)
+        parts = []
+        for i, (start, end) in enumerate(self.regions):
+            if i:
+                parts.append(gap)
+            parts.append(wav[start:end])
+        return np.concatenate(parts) if parts else wav[:0]
+
+    def to_original(self, times) -> np.ndarray:
+        """Vectorized map of trimmed-array seconds to original seconds.
+
+        Times that fall in a gap between regions land on the end of the
+        preceding region.
+        """
+        t = np.asarray(times, dtype=np.float64) * self.sr
+        if self.is_identity or not len(self.regions):
+            return t / self.sr
+        k = np.clip(np.searchsorted(self.trimmed_starts, t, side="right") - 1, 0, len(self.regions) - 1)
+        offset = np.minimum(t - self.trimmed_starts[k], self.lengths[k])
+        return (self.regions[k, 0] + np.maximum(offset, 0)) / self.sr
+
+    def map_segments(self, segments: List[Dict]) -> List[Dict]:
+        """Rewrite segment and word start/end times in place onto the original timeline."""
+        if self.is_identity:
+            return segments
+        refs = []
+        for seg in segments:
+            refs.append(seg)
+            refs.extend(w for w in seg.get("words", []) or [] if isinstance(w, dict))
+        for key in ("start", "end"):
+            holders = [r for r in refs if r.get(key) is not None]
+            if holders:
+                mapped = self.to_original([r[key] for r in holders])
+                for r, value in zip(holders, mapped):
+                    r[key] = float(value)
+        return segments
+
+    def summary(self) -> Dict:
+        total = self.total_samples / self.sr
+        return {
+            "regions": int(len(self.regions)),
+            "audio_seconds": round(total, 2),
+            "skipped_seconds": round(self.skipped_seconds, 2),
+            "skipped_share": round(self.skipped_seconds / total, 4) if total else 0.0,
+        }
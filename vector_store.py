@@ -1,16 +1,40 @@
 """Lightweight on-disk vector store using SQLite BLOBs.
 
 Stores per-chunk embeddings along with metadata so we can search locally
-without external services or extra dependencies.
+without external services or extra dependencies. With the "memmap" layout
+the vectors live in an append-only sidecar file instead and the chunks table
+only keeps each row's offset into it.
 """
 
 import os
 import sqlite3
-from typing import Dict, Iterable, List, Optional
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
 
-from config import VECTOR_DB_PATH
+from ann_index import IVFIndex
+from config import (
+    ANN_ENABLED,
+    ANN_MIN_CHUNKS,
+    ANN_NPROBE,
+    VECTOR_DB_PATH,
+    VECTOR_PRECISION,
+    VECTOR_RESCORE_FACTOR,
+    VECTOR_SIDECAR_PATH,
+    VECTOR_STORAGE_LAYOUT,
+)
+
+
+PRECISIONS = ("float32", "float16", "int8", "binary")
+LAYOUTS = ("sqlite", "memmap")
+
+_ROW_COLUMNS = (
+    "id, session_path, chunk_id, start, end, speakers, text, embedding, embedding_dtype, embedding_scale, vec_offset"
+)
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
 
 
 def init_vector_db():
@@ -27,53 +51,324 @@ def init_vector_db():
             end REAL,
             speakers TEXT,
             text TEXT,
-            embedding BLOB
+            embedding BLOB,
+            embedding_dtype TEXT,
+            embedding_scale REAL,
+            vec_offset INTEGER
         )
         """
     )
+    # Databases created before quantized/sidecar storage lack these columns;
+    # a NULL dtype is read back as float32.
+    columns = {row[1] for row in c.execute("PRAGMA table_info(chunks)")}
+    for name, kind in (("embedding_dtype", "TEXT"), ("embedding_scale", "REAL"), ("vec_offset", "INTEGER")):
+        if name not in columns:
+            c.execute(f"ALTER TABLE chunks ADD COLUMN {name} {kind}")
     c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_session ON chunks(session_path)")
+    c.execute("CREATE TABLE IF NOT EXISTS vector_meta (key TEXT PRIMARY KEY, value TEXT)")
     conn.commit()
     conn.close()
 
 
-def _to_blob(vec: Iterable[float]) -> bytes:
-    arr = np.asarray(list(vec), dtype=np.float32)
-    return arr.tobytes()
+def _storage_dtype(precision: str) -> str:
+    """Column encoding for a precision; binary search rescores from float16 rows."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown vector precision {precision!r}; expected one of {PRECISIONS}")
+    return "float16" if precision == "binary" else precision
+
+
+def _quantize(block: np.ndarray, precision: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode float32 rows as (codes, per-row scales) at `precision`."""
+    scales = np.ones(len(block), dtype=np.float32)
+    if precision == "binary":
+        return np.packbits(block > 0, axis=1), scales
+    if precision == "int8":
+        peak = np.abs(block).max(axis=1) if block.size else np.zeros(len(block), dtype=np.float32)
+        scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+        return np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8), scales
+    return block.astype(precision), scales
+
+
+def _dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    rows = codes.astype(np.float32)
+    if codes.dtype == np.int8 and scales is not None:
+        rows *= scales[:, None]
+    return rows
+
+
+def _normalize(block: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(block, axis=1)
+    norms[norms == 0] = 1.0
+    return block / norms[:, None]
+
+
+def _to_blob(vec: Iterable[float], dtype: str = "float32") -> Tuple[bytes, float]:
+    """Encode a vector for the embedding column; returns (blob, scale)."""
+    arr = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+    codes, scales = _quantize(arr, dtype)
+    return codes.tobytes(), float(scales[0])
+
+
+def _from_blob(blob: bytes, dtype: Optional[str] = None, scale: Optional[float] = None) -> np.ndarray:
+    dtype = dtype or "float32"
+    arr = np.frombuffer(blob, dtype=dtype)
+    if dtype == "float32":
+        return arr
+    arr = arr.astype(np.float32)
+    if scale is not None and scale != 1.0:
+        arr *= np.float32(scale)
+    return arr
+
+
+# --- Memory-mapped sidecar --------------------------------------------------
+
+
+def _sidecar_meta(conn: sqlite3.Connection) -> Tuple[Optional[str], int]:
+    meta = dict(conn.execute("SELECT key, value FROM vector_meta WHERE key IN ('sidecar_dtype', 'sidecar_dim')"))
+    return meta.get("sidecar_dtype"), int(meta.get("sidecar_dim", 0))
+
+
+def _set_sidecar_meta(conn: sqlite3.Connection, dtype: str, dim: int):
+    conn.executemany(
+        "INSERT OR REPLACE INTO vector_meta (key, value) VALUES (?, ?)",
+        [("sidecar_dtype", dtype), ("sidecar_dim", str(dim))],
+    )
+
+
+def open_sidecar(path: str, dtype: Optional[str], dim: int) -> Optional[np.memmap]:
+    """Map the sidecar read-only as a (rows, dim) array; None when empty."""
+    if not dtype or dim <= 0 or not os.path.exists(path):
+        return None
+    row_bytes = np.dtype(dtype).itemsize * dim
+    rows = os.path.getsize(path) // row_bytes
+    if rows == 0:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows, dim))
+
+
+def _append_sidecar(conn: sqlite3.Connection, vectors: np.ndarray) -> Tuple[np.ndarray, str, np.ndarray]:
+    """Append normalised rows to the sidecar; returns (offsets, dtype, scales).
+
+    Must run inside a write transaction on `conn` so concurrent writers in
+    other processes cannot interleave their appends.
+    """
+    dtype, dim = _sidecar_meta(conn)
+    if not dtype:
+        dtype, dim = _storage_dtype(VECTOR_PRECISION), vectors.shape[1]
+        _set_sidecar_meta(conn, dtype, dim)
+    if vectors.shape[1] != dim:
+        raise ValueError(f"Embedding dim {vectors.shape[1]} does not match sidecar dim {dim}")
+    codes, scales = _quantize(_normalize(vectors), dtype)
+    row_bytes = codes.itemsize * dim
+    mode = "r+b" if os.path.exists(VECTOR_SIDECAR_PATH) else "w+b"
+    with open(VECTOR_SIDECAR_PATH, mode) as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        # Drop a torn trailing row left by an interrupted write.
+        aligned = size - size % row_bytes
+        if aligned != size:
+            f.truncate(aligned)
+        f.seek(aligned)
+        f.write(np.ascontiguousarray(codes).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    start = aligned // row_bytes
+    return np.arange(start, start + len(codes), dtype=np.int64), dtype, scales
+
 
+def compact_sidecar(dtype: Optional[str] = None) -> Tuple[int, int]:
+    """Rewrite the sidecar with only live rows (optionally at a new dtype).
+
+    Rows of replaced sessions are tombstones: nothing in the chunks table
+    points at them any more. Returns (live rows, reclaimed rows).
+    """
+    init_vector_db()
+    conn = sqlite3.connect(VECTOR_DB_PATH, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        old_dtype, dim = _sidecar_meta(conn)
+        sidecar = open_sidecar(VECTOR_SIDECAR_PATH, old_dtype, dim)
+        if sidecar is None:
+            conn.execute("ROLLBACK")
+            return 0, 0
+        new_dtype = _storage_dtype(dtype) if dtype else old_dtype
+        rows = conn.execute(
+            "SELECT id, vec_offset, embedding_scale FROM chunks WHERE vec_offset IS NOT NULL ORDER BY vec_offset"
+        ).fetchall()
+        tmp = VECTOR_SIDECAR_PATH + ".tmp"
+        updates = []
+        with open(tmp, "wb") as f:
+            for lo in range(0, len(rows), 4096):
+                part = rows[lo : lo + 4096]
+                offsets = np.array([r[1] for r in part], dtype=np.int64)
+                scales = np.array([r[2] if r[2] is not None else 1.0 for r in part], dtype=np.float32)
+                block = _dequantize(np.asarray(sidecar[offsets]), scales)
+                codes, new_scales = _quantize(block, new_dtype)
+                f.write(np.ascontiguousarray(codes).tobytes())
+                updates.extend(
+                    (lo + i, new_dtype, float(new_scales[i]), part[i][0]) for i in range(len(part))
+                )
+            f.flush()
+            os.fsync(f.fileno())
+        conn.executemany("UPDATE chunks SET vec_offset = ?, embedding_dtype = ?, embedding_scale = ? WHERE id = ?", updates)
+        _set_sidecar_meta(conn, new_dtype, dim)
+        reclaimed = len(sidecar) - len(rows)
+        del sidecar
+        with _index.lock:
+            # Windows refuses to replace a file that is still mapped.
+            _index.release_sidecar()
+            os.replace(tmp, VECTOR_SIDECAR_PATH)
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    _index.invalidate()
+    return len(rows), reclaimed
+
+
+def convert_layout(layout: str, batch_size: int = 2048) -> int:
+    """Move every stored embedding into `layout`; returns rows moved."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown vector layout {layout!r}; expected one of {LAYOUTS}")
+    init_vector_db()
+    conn = sqlite3.connect(VECTOR_DB_PATH, isolation_level=None)
+    moved = 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if layout == "memmap":
+            rows = conn.execute(
+                "SELECT id, embedding, embedding_dtype, embedding_scale FROM chunks WHERE embedding IS NOT NULL ORDER BY id"
+            ).fetchall()
+            for lo in range(0, len(rows), batch_size):
+                part = rows[lo : lo + batch_size]
+                block = np.vstack([_from_blob(r[1], r[2], r[3]) for r in part]).astype(np.float32)
+                offsets, dtype, scales = _append_sidecar(conn, block)
+                conn.executemany(
+                    "UPDATE chunks SET embedding = NULL, vec_offset = ?, embedding_dtype = ?, embedding_scale = ? WHERE id = ?",
+                    [(int(offsets[i]), dtype, float(scales[i]), part[i][0]) for i in range(len(part))],
+                )
+                moved += len(part)
+        else:
+            dtype, dim = _sidecar_meta(conn)
+            sidecar = open_sidecar(VECTOR_SIDECAR_PATH, dtype, dim)
+            rows = conn.execute(
+                "SELECT id, vec_offset, embedding_scale FROM chunks WHERE vec_offset IS NOT NULL AND embedding IS NULL"
+            ).fetchall()
+            for row_id, offset, scale in rows:
+                vec = _dequantize(np.asarray(sidecar[[offset]]), np.array([scale or 1.0], dtype=np.float32))[0]
+                blob, new_scale = _to_blob(vec, dtype)
+                conn.execute(
+                    "UPDATE chunks SET embedding = ?, embedding_scale = ?, vec_offset = NULL WHERE id = ?",
+                    (blob, new_scale, row_id),
+                )
+                moved += 1
+        conn.execute("COMMIT")
+        conn.execute("VACUUM")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    _index.invalidate()
+    return moved
+
+
+def _row_vector(row: tuple, sidecar: Optional[np.memmap]) -> Optional[np.ndarray]:
+    """Decode a _ROW_COLUMNS row's embedding from its BLOB or sidecar slot."""
+    if row[7] is not None:
+        return _from_blob(row[7], row[8], row[9])
+    if row[10] is not None and sidecar is not None and row[10] < len(sidecar):
+        scale = np.array([row[9] if row[9] is not None else 1.0], dtype=np.float32)
+        return _dequantize(np.asarray(sidecar[[row[10]]]), scale)[0]
+    return None
 
-def _from_blob(blob: bytes) -> np.ndarray:
-    return np.frombuffer(blob, dtype=np.float32)
+
+def _open_current_sidecar(conn: sqlite3.Connection) -> Optional[np.memmap]:
+    dtype, dim = _sidecar_meta(conn)
+    return open_sidecar(VECTOR_SIDECAR_PATH, dtype, dim)
+
+
+# --- Table access -------------------------------------------------------------
 
 
 def upsert_chunk_embeddings(session_path: str, chunks: List[Dict]):
     """Replace embeddings for a given session_path with the supplied chunks."""
+    _write_chunks(session_path, chunks, replace=True)
+
+
+def append_chunk_embeddings(session_path: str, chunks: List[Dict]):
+    """Add chunks to a session without touching its existing rows (live sessions)."""
+    _write_chunks(session_path, chunks, replace=False)
+
+
+def _write_chunks(session_path: str, chunks: List[Dict], replace: bool):
     if not chunks:
         return
     init_vector_db()
-    conn = sqlite3.connect(VECTOR_DB_PATH)
+    kept = [ch for ch in chunks if ch.get("embedding") is not None]
+    conn = sqlite3.connect(VECTOR_DB_PATH, isolation_level=None)
     c = conn.cursor()
-    c.execute("DELETE FROM chunks WHERE session_path = ?", (session_path,))
-    rows = [
-        (
-            session_path,
-            ch.get("chunk_id"),
-            float(ch.get("start", 0.0)),
-            float(ch.get("end", 0.0)),
-            ",".join(ch.get("speakers", [])),
-            ch.get("text", ""),
-            _to_blob(ch["embedding"]),
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        # Only a delta on top of an index that has seen every earlier write is safe to patch in.
+        in_sync = _index.in_sync()
+        if replace:
+            c.execute("DELETE FROM chunks WHERE session_path = ?", (session_path,))
+        (last_id,) = c.execute("SELECT COALESCE(MAX(id), 0) FROM chunks").fetchone()
+        if VECTOR_STORAGE_LAYOUT == "memmap" and kept:
+            block = np.vstack([np.asarray(ch["embedding"], dtype=np.float32).ravel() for ch in kept])
+            offsets, dtype, scales = _append_sidecar(conn, block)
+            encoded = [(None, dtype, float(scales[i]), int(offsets[i])) for i in range(len(kept))]
+        else:
+            dtype = _storage_dtype(VECTOR_PRECISION)
+            encoded = []
+            for ch in kept:
+                blob, scale = _to_blob(ch["embedding"], dtype)
+                encoded.append((blob, dtype, scale, None))
+        rows = [
+            (
+                session_path,
+                ch.get("chunk_id"),
+                float(ch.get("start", 0.0)),
+                float(ch.get("end", 0.0)),
+                ",".join(ch.get("speakers", [])),
+                ch.get("text", ""),
+            )
+            + enc
+            for ch, enc in zip(kept, encoded)
+        ]
+        c.executemany(
+            """
+            INSERT INTO chunks (session_path, chunk_id, start, end, speakers, text, embedding, embedding_dtype, embedding_scale, vec_offset)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows,
         )
-        for ch in chunks
-        if ch.get("embedding") is not None
-    ]
-    c.executemany(
-        """
-        INSERT INTO chunks (session_path, chunk_id, start, end, speakers, text, embedding)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        rows,
-    )
-    conn.commit()
+        (data_version,) = c.execute("PRAGMA data_version").fetchone()
+        c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        conn.close()
+        raise
+    if _index.loaded:
+        stamp = _index._db_stamp()
+        # data_version moves only on other connections' commits: one landing
+        # between our COMMIT and the stamp above would be hidden by it.
+        if not in_sync or c.execute("PRAGMA data_version").fetchone()[0] != data_version:
+            _index.invalidate()
+        else:
+            inserted = c.execute(
+                f"SELECT {_ROW_COLUMNS} FROM chunks WHERE session_path = ? AND id > ?", (session_path, last_id)
+            ).fetchall()
+            if replace:
+                _index.replace_session(session_path, inserted, stamp, ann=_ann)
+            else:
+                _index.add_rows(inserted, stamp, ann=_ann)
     conn.close()
 
 
@@ -81,48 +376,533 @@ def iter_chunks(session_filter: Optional[str] = None) -> Iterable[Dict]:
     init_vector_db()
     conn = sqlite3.connect(VECTOR_DB_PATH)
     c = conn.cursor()
+    sidecar = _open_current_sidecar(conn)
     if session_filter:
-        cursor = c.execute(
-            "SELECT session_path, chunk_id, start, end, speakers, text, embedding FROM chunks WHERE session_path = ?",
-            (session_filter,),
-        )
+        cursor = c.execute(f"SELECT {_ROW_COLUMNS} FROM chunks WHERE session_path = ?", (session_filter,))
     else:
-        cursor = c.execute("SELECT session_path, chunk_id, start, end, speakers, text, embedding FROM chunks")
+        cursor = c.execute(f"SELECT {_ROW_COLUMNS} FROM chunks")
     for row in cursor:
+        emb = _row_vector(row, sidecar)
+        if emb is None:
+            continue
         yield {
-            "session_path": row[0],
-            "chunk_id": row[1],
-            "start": row[2],
-            "end": row[3],
-            "speakers": row[4].split(",") if row[4] else [],
-            "text": row[5],
-            "embedding": _from_blob(row[6]),
+            "session_path": row[1],
+            "chunk_id": row[2],
+            "start": row[3],
+            "end": row[4],
+            "speakers": row[5].split(",") if row[5] else [],
+            "text": row[6],
+            "embedding": emb,
         }
     conn.close()
 
 
-def search_similar(query_embedding: List[float], top_k: int = 30, session_filter: Optional[str] = None) -> List[Dict]:
-    """Return top-k most similar chunks."""
+def requantize(precision: str, batch_size: int = 2048) -> int:
+    """Rewrite every stored embedding at `precision`; returns rows converted.
+
+    This is the migration path for existing databases: set VECTOR_PRECISION
+    and run it once (rebuild_index.py --requantize) so old rows shrink too.
+    Sidecar rows are converted by rewriting the sidecar.
+    """
+    dtype = _storage_dtype(precision)
+    init_vector_db()
+    conn = sqlite3.connect(VECTOR_DB_PATH)
+    read = conn.cursor()
+    write = conn.cursor()
+    converted = 0
+    read.execute(
+        "SELECT id, embedding, embedding_dtype, embedding_scale FROM chunks "
+        "WHERE embedding IS NOT NULL AND IFNULL(embedding_dtype, 'float32') != ?",
+        (dtype,),
+    )
+    while True:
+        batch = read.fetchmany(batch_size)
+        if not batch:
+            break
+        updates = []
+        for row_id, blob, old_dtype, old_scale in batch:
+            new_blob, scale = _to_blob(_from_blob(blob, old_dtype, old_scale), dtype)
+            updates.append((new_blob, dtype, scale, row_id))
+        write.executemany("UPDATE chunks SET embedding = ?, embedding_dtype = ?, embedding_scale = ? WHERE id = ?", updates)
+        converted += len(updates)
+    sidecar_dtype, _ = _sidecar_meta(conn)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    if sidecar_dtype and sidecar_dtype != dtype:
+        converted += compact_sidecar(dtype)[0]
+    _index.invalidate()
+    return converted
+
+
+def _fetch_vectors(db_path: str, row_ids: np.ndarray, dim: int) -> np.ndarray:
+    """Load stored embeddings for `row_ids`, in order, as normalised float32 rows."""
+    out = np.zeros((len(row_ids), dim), dtype=np.float32)
+    where = {int(r): i for i, r in enumerate(row_ids)}
+    conn = sqlite3.connect(db_path)
+    try:
+        sidecar = _open_current_sidecar(conn)
+        ids = list(where)
+        for lo in range(0, len(ids), 900):
+            part = ids[lo : lo + 900]
+            marks = ",".join("?" * len(part))
+            for row in conn.execute(f"SELECT {_ROW_COLUMNS} FROM chunks WHERE id IN ({marks})", part):
+                vec = _row_vector(row, sidecar)
+                if vec is not None and vec.size == dim:
+                    out[where[row[0]]] = vec
+    finally:
+        conn.close()
+    return _normalize(out)
+
+
+class ChunkIndex:
+    """Process-resident copy of the chunks table for fast similarity search.
+
+    Embeddings are L2-normalised and held as one contiguous code matrix at
+    `precision` (float32, float16, per-row scaled int8, or packed sign bits)
+    with parallel metadata arrays. The index loads lazily on first search, is
+    patched in place when a session is replaced through
+    upsert_chunk_embeddings, and reloads when another process has written to
+    the database or sidecar. Binary codes only pick a Hamming shortlist, which
+    is rescored against the stored vectors.
+
+    With the memmap layout and a matching precision the code matrix *is* the
+    read-only sidecar mapping: nothing is copied, and worker processes share
+    the same page-cached vectors. `code_rows` maps positions to matrix rows.
+    """
+
+    def __init__(self, db_path: str = VECTOR_DB_PATH, precision: str = VECTOR_PRECISION):
+        _storage_dtype(precision)
+        self.db_path = db_path
+        self.precision = precision
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._stamp = None
+        # Bumped whenever positions are renumbered (reload or compaction).
+        self.generation = 0
+        self.sidecar: Optional[np.memmap] = None
+        self.sidecar_dtype: Optional[str] = None
+        self.shared = False
+        self._reset(0)
+
+    def _code_shape(self, dim: int) -> Tuple[int, np.dtype]:
+        if self.precision == "binary":
+            return (dim + 7) // 8, np.uint8
+        return dim, np.dtype(self.precision)
+
+    def _reset(self, dim: int, capacity: int = 0):
+        self.dim = dim
+        self.size = 0
+        if not self.shared:
+            width, dtype = self._code_shape(dim)
+            self.codes = np.zeros((capacity, width), dtype=dtype)
+        self.code_rows = np.zeros(capacity, dtype=np.int64)
+        self.scales = np.ones(capacity, dtype=np.float32)
+        self.disk_scales = np.ones(capacity, dtype=np.float32)
+        self.vec_offsets = np.full(capacity, -1, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.starts = np.zeros(capacity, dtype=np.float64)
+        self.ends = np.zeros(capacity, dtype=np.float64)
+        self.row_ids = np.zeros(capacity, dtype=np.int64)
+        self.session_paths: List[str] = []
+        self.chunk_ids: List[str] = []
+        self.speakers: List[List[str]] = []
+        self.texts: List[str] = []
+        self.by_session: Dict[str, List[int]] = {}
+        self.dead = 0
+        self.generation += 1
+
+    def _db_stamp(self):
+        stamp = []
+        for path in (self.db_path, VECTOR_SIDECAR_PATH):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _grow(self, needed: int):
+        capacity = self.row_ids.shape[0]
+        if needed <= capacity:
+            return
+        new_cap = max(needed, capacity * 2, 1024)
+        names = ["code_rows", "scales", "disk_scales", "vec_offsets", "alive", "starts", "ends", "row_ids"]
+        if not self.shared:
+            names.append("codes")
+        for name in names:
+            old = getattr(self, name)
+            new = np.zeros((new_cap,) + old.shape[1:], dtype=old.dtype)
+            new[: self.size] = old[: self.size]
+            setattr(self, name, new)
+
+    def _refresh_sidecar(self, conn: sqlite3.Connection):
+        dtype, dim = _sidecar_meta(conn)
+        self.sidecar = open_sidecar(VECTOR_SIDECAR_PATH, dtype, dim)
+        self.sidecar_dtype = dtype
+        if self.shared:
+            self.codes = self.sidecar if self.sidecar is not None else self.codes[:0]
+
+    def _append_rows(self, rows: List[tuple]):
+        if self.shared:
+            self._append_shared(rows)
+            return
+        vecs = []
+        kept = []
+        for row in rows:
+            emb = _row_vector(row, self.sidecar)
+            if emb is None:
+                continue
+            if self.dim == 0:
+                self.dim = emb.size
+                width, dtype = self._code_shape(self.dim)
+                self.codes = np.zeros((self.codes.shape[0], width), dtype=dtype)
+            if emb.size != self.dim:
+                print(f"[warn] Skipping chunk {row[2]} of {row[1]}: embedding dim {emb.size} != {self.dim}")
+                continue
+            vecs.append(emb)
+            kept.append(row)
+        if not kept:
+            return
+        block = np.vstack(vecs).astype(np.float32)
+        norms = np.linalg.norm(block, axis=1)
+        nonzero = norms > 0
+        block[nonzero] /= norms[nonzero, None]
+        codes, scales = _quantize(block, self.precision)
+
+        base = self.size
+        self._grow(base + len(kept))
+        self.codes[base : base + len(kept)] = codes
+        self.scales[base : base + len(kept)] = scales
+        self.code_rows[base : base + len(kept)] = np.arange(base, base + len(kept))
+        self.alive[base : base + len(kept)] = nonzero
+        self.dead += int((~nonzero).sum())
+        self._append_meta(base, kept)
+
+    def _append_shared(self, rows: List[tuple]):
+        kept = []
+        for row in rows:
+            if row[10] is None or row[10] >= len(self.codes):
+                print(f"[warn] Skipping chunk {row[2]} of {row[1]}: not in the sidecar (run --layout memmap)")
+                continue
+            kept.append(row)
+        if not kept:
+            return
+        base = self.size
+        self._grow(base + len(kept))
+        for offset, row in enumerate(kept):
+            self.code_rows[base + offset] = row[10]
+            self.scales[base + offset] = row[9] if row[9] is not None else 1.0
+        self.alive[base : base + len(kept)] = True
+        self._append_meta(base, kept)
+
+    def _append_meta(self, base: int, kept: List[tuple]):
+        for offset, row in enumerate(kept):
+            pos = base + offset
+            self.row_ids[pos] = row[0]
+            self.starts[pos] = row[3]
+            self.ends[pos] = row[4]
+            self.disk_scales[pos] = row[9] if row[9] is not None else 1.0
+            self.vec_offsets[pos] = row[10] if row[10] is not None else -1
+            self.session_paths.append(row[1])
+            self.chunk_ids.append(row[2])
+            self.speakers.append(row[5].split(",") if row[5] else [])
+            self.texts.append(row[6])
+            self.by_session.setdefault(row[1], []).append(pos)
+        self.size = base + len(kept)
+
+    def _load(self):
+        init_vector_db()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            stamp = self._db_stamp()
+            self.shared = False
+            self._refresh_sidecar(conn)
+            # Zero-copy only when the sidecar already holds our resident codes.
+            self.shared = (
+                VECTOR_STORAGE_LAYOUT == "memmap"
+                and self.sidecar is not None
+                and self.sidecar_dtype == self.precision
+            )
+            if self.shared:
+                self.codes = self.sidecar
+            count = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            cursor = conn.execute(f"SELECT {_ROW_COLUMNS} FROM chunks ORDER BY id")
+            self._reset(self.sidecar.shape[1] if self.shared else 0, count)
+            while True:
+                batch = cursor.fetchmany(4096)
+                if not batch:
+                    break
+                self._append_rows(batch)
+        finally:
+            conn.close()
+        self._stamp = stamp
+        self._loaded = True
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[: self.size])
+        session_paths = [self.session_paths[i] for i in keep]
+        chunk_ids = [self.chunk_ids[i] for i in keep]
+        speakers = [self.speakers[i] for i in keep]
+        texts = [self.texts[i] for i in keep]
+        arrays = {
+            name: getattr(self, name)[keep]
+            for name in ("scales", "disk_scales", "vec_offsets", "starts", "ends", "row_ids")
+        }
+        if self.shared:
+            arrays["code_rows"] = self.code_rows[keep]
+        else:
+            codes = self.codes[self.code_rows[keep]]
+        self._reset(self.dim, len(keep))
+        if not self.shared:
+            self.codes[: len(keep)] = codes
+            self.code_rows[: len(keep)] = np.arange(len(keep))
+        for name, values in arrays.items():
+            getattr(self, name)[: len(keep)] = values
+        self.alive[: len(keep)] = True
+        self.session_paths, self.chunk_ids, self.speakers, self.texts = session_paths, chunk_ids, speakers, texts
+        self.size = len(keep)
+        for pos, session_path in enumerate(session_paths):
+            self.by_session.setdefault(session_path, []).append(pos)
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded or self._db_stamp() != self._stamp:
+                self._load()
+
+    def in_sync(self) -> bool:
+        """True when the loaded matrix reflects the database and sidecar on disk."""
+        with self._lock:
+            return self._loaded and self._db_stamp() == self._stamp
+
+    def replace_session(self, session_path: str, rows: List[tuple], stamp: tuple, ann: Optional[IVFIndex] = None):
+        """Swap the rows of one session for freshly inserted ones.
+
+        `stamp` is the on-disk state right after that write; the caller checks
+        that nothing else was written since the index last synced.
+        """
+        self._patch(rows, stamp, ann, replaced=session_path)
+
+    def add_rows(self, rows: List[tuple], stamp: tuple, ann: Optional[IVFIndex] = None):
+        """Append freshly inserted rows, keeping everything already indexed."""
+        self._patch(rows, stamp, ann, replaced=None)
+
+    def _patch(self, rows: List[tuple], stamp: tuple, ann: Optional[IVFIndex], replaced: Optional[str]):
+        with self._lock:
+            if not self._loaded or self._stamp == stamp:
+                # Unloaded, or a reload since the write already picked the rows up.
+                return
+            if any(row[10] is not None for row in rows):
+                # The sidecar grew: remap it so the new rows are visible.
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    self._refresh_sidecar(conn)
+                finally:
+                    conn.close()
+                if VECTOR_STORAGE_LAYOUT == "memmap" and not self.shared and self.sidecar_dtype == self.precision:
+                    # First rows of a fresh sidecar: switch to zero-copy on reload.
+                    self._loaded = False
+                    return
+            for pos in self.by_session.pop(replaced, []) if replaced is not None else []:
+                if self.alive[pos]:
+                    self.alive[pos] = False
+                    self.dead += 1
+            self._append_rows(rows)
+            if self.dead > 1024 and self.dead > self.size // 4:
+                self._compact()
+            self._stamp = stamp
+            if ann is not None and ann.trained and ann.sync(self):
+                ann.save(self)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
+
+    @property
+    def nbytes(self) -> int:
+        """Resident bytes for vector codes (mapped sidecar pages count as shared)."""
+        per_row = self.codes.itemsize * self.codes.shape[1] + (4 if self.precision == "int8" else 0)
+        return int(per_row * self.size)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def release_sidecar(self):
+        """Drop every mapping of the sidecar; the next search remaps it."""
+        with self._lock:
+            self.sidecar = None
+            if self.shared:
+                self.codes = np.empty((0,) + self.codes.shape[1:], dtype=self.codes.dtype)
+            self._loaded = False
+
+    def vectors(self, positions: np.ndarray) -> np.ndarray:
+        """Normalised float32 rows for `positions` (read from disk for binary codes)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.precision == "binary":
+            offsets = self.vec_offsets[positions]
+            if self.sidecar is not None and positions.size and (offsets >= 0).all():
+                rows = _dequantize(np.asarray(self.sidecar[offsets]), self.disk_scales[positions])
+                return _normalize(rows)
+            return _fetch_vectors(self.db_path, self.row_ids[positions], self.dim)
+        return _dequantize(np.asarray(self.codes[self.code_rows[positions]]), self.scales[positions])
+
+    def _raw_scores(self, rows: Optional[np.ndarray], query: np.ndarray, block: int = 65536) -> np.ndarray:
+        """Unscaled similarity of `query` to code rows (all rows when None).
+
+        Float32 codes score with one product; compact codes are widened block
+        by block; binary codes return 1 - 2 * hamming / dim, an estimate that is
+        only used to rank a shortlist.
+        """
+        total = len(self.codes) if self.shared else self.size
+        n = total if rows is None else len(rows)
+        if self.precision == "float32":
+            codes = self.codes[:total] if rows is None else self.codes[rows]
+            return codes @ query
+        out = np.empty(n, dtype=np.float32)
+        if self.precision == "binary":
+            qbits = np.packbits(query > 0)
+        for lo in range(0, n, block):
+            hi = min(n, lo + block)
+            codes = self.codes[lo:hi] if rows is None else self.codes[rows[lo:hi]]
+            if self.precision == "binary":
+                ham = _POPCOUNT[np.bitwise_xor(codes, qbits)].sum(axis=1, dtype=np.int32)
+                out[lo:hi] = 1.0 - 2.0 * ham / self.dim
+            else:
+                out[lo:hi] = codes.astype(np.float32) @ query
+        return out
+
+    def _scores(self, positions: np.ndarray, query: np.ndarray, full_scan: bool = False) -> np.ndarray:
+        rows = self.code_rows[positions]
+        if full_scan:
+            scores = self._raw_scores(None, query)[rows]
+        else:
+            scores = self._raw_scores(rows, query)
+        if self.precision == "int8":
+            scores = scores * self.scales[positions]
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        session_filter: Optional[str] = None,
+        ann: Optional[IVFIndex] = None,
+        nprobe: int = ANN_NPROBE,
+        rescore_factor: int = VECTOR_RESCORE_FACTOR,
+    ) -> List[Dict]:
+        self.ensure_loaded()
+        with self._lock:
+            if self.size == 0 or top_k <= 0:
+                return []
+            if query.size != self.dim:
+                raise ValueError(f"Query dim {query.size} does not match index dim {self.dim}")
+            positions = None
+            if ann is not None and not session_filter:
+                ann.ensure_ready(self)
+                positions = ann.candidates(self, query, nprobe)
+                if positions.size < top_k:
+                    positions = None
+            if positions is not None:
+                scores = self._scores(positions, query)
+            elif session_filter:
+                positions = np.asarray(self.by_session.get(session_filter, []), dtype=np.int64)
+                positions = positions[self.alive[positions]]
+                scores = self._scores(positions, query)
+            else:
+                positions = np.flatnonzero(self.alive[: self.size])
+                scores = self._scores(positions, query, full_scan=True)
+            if positions.size == 0:
+                return []
+            if self.precision == "binary":
+                # Hamming shortlist, then exact cosine against stored vectors.
+                n_short = min(positions.size, max(top_k * rescore_factor, top_k))
+                short = np.sort(np.argpartition(-scores, n_short - 1)[:n_short])
+                positions = positions[short]
+                scores = self.vectors(positions) @ query
+            k = min(top_k, positions.size)
+            top = np.sort(np.argpartition(-scores, k - 1)[:k])
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [self._result(int(positions[i]), float(scores[i])) for i in top]
+
+    def _result(self, pos: int, similarity: float) -> Dict:
+        return {
+            "similarity": similarity,
+            "session_path": self.session_paths[pos],
+            "chunk_id": self.chunk_ids[pos],
+            "start": float(self.starts[pos]),
+            "end": float(self.ends[pos]),
+            "speakers": list(self.speakers[pos]),
+            "text": self.texts[pos],
+        }
+
+
+_index = ChunkIndex()
+_ann = IVFIndex()
+
+
+def get_index() -> ChunkIndex:
+    return _index
+
+
+def get_ann_index() -> IVFIndex:
+    return _ann
+
+
+def search_similar(
+    query_embedding: List[float],
+    top_k: int = 30,
+    session_filter: Optional[str] = None,
+    exact: bool = False,
+    nprobe: Optional[int] = None,
+    ann_min_chunks: int = ANN_MIN_CHUNKS,
+) -> List[Dict]:
+    """Return top-k most similar chunks.
+
+    Large corpora go through the IVF index unless `exact` is set; `nprobe`
+    trades recall for latency.
+    """
     query = np.asarray(query_embedding, dtype=np.float32)
     if query.size == 0:
         return []
-    results: List[Dict] = []
-    for ch in iter_chunks(session_filter):
-        emb = ch["embedding"]
-        denom = (np.linalg.norm(query) * np.linalg.norm(emb))
-        if denom == 0:
-            continue
-        sim = float(np.dot(query, emb) / denom)
-        results.append(
-            {
-                "similarity": sim,
-                "session_path": ch["session_path"],
-                "chunk_id": ch["chunk_id"],
-                "start": ch["start"],
-                "end": ch["end"],
-                "speakers": ch.get("speakers", []),
-                "text": ch.get("text", ""),
-            }
-        )
-    results.sort(key=lambda x: x["similarity"], reverse=True)
-    return results[:top_k]
+    norm = np.linalg.norm(query)
+    if norm == 0:
+        return []
+    _index.ensure_loaded()
+    use_ann = ANN_ENABLED and not exact and (_index.size - _index.dead) >= ann_min_chunks
+    return _index.search(
+        query / norm,
+        top_k,
+        session_filter,
+        ann=_ann if use_ann else None,
+        nprobe=nprobe or ANN_NPROBE,
+    )
+
+
+def quantization_report(k: int = 10, n_queries: int = 200, noise: float = 0.05, seed: int = 0):
+    """Print memory per vector and recall@k of each precision against float32."""
+    index = ChunkIndex(precision="float32")
+    index.ensure_loaded()
+    live = np.flatnonzero(index.alive[: index.size])
+    if live.size == 0:
+        print("Vector index is empty.")
+        return
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(live, size=min(n_queries, live.size), replace=False)
+    queries = index.vectors(picks) + rng.normal(scale=noise, size=(picks.size, index.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [{r["chunk_id"] + "@" + r["session_path"] for r in index.search(q, k)} for q in queries]
+    print(f"chunks={live.size} dim={index.dim} queries={len(queries)} k={k}")
+    print(f"{'precision':>10} {'bytes/vec':>10} {'recall@k':>9} {'ms/query':>9}")
+    for precision in PRECISIONS:
+        candidate = index if precision == "float32" else ChunkIndex(precision=precision)
+        candidate.ensure_loaded()
+        started = time.perf_counter()
+        found = [{r["chunk_id"] + "@" + r["session_path"] for r in candidate.search(q, k)} for q in queries]
+        ms = (time.perf_counter() - started) * 1000 / len(queries)
+        recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+        print(f"{precision:>10} {candidate.nbytes / candidate.size:>10.0f} {recall:>9.3f} {ms:>9.2f}")
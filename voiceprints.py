@@ -1,18 +1,232 @@
-import os
+"""Named speaker voiceprints, stored in SQLite and matched in memory.
+
+Each voiceprint is one row (id, name, float32 embedding blob). The store
+keeps every embedding as a row of a unit-normalized matrix, so matching all
+speakers of a transcript against all voiceprints is a single matrix product.
+Changes stay in memory until `flush()`, which writes only the dirty rows in
+one transaction and does nothing when nothing changed. The store reloads
+when another process has written the database since it last looked.
+
+A legacy `voiceprints.json` is imported once, then renamed to `.migrated`.
+"""
+
 import json
-from config import VOICEPRINTS_FILE
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from config import VOICEPRINT_MATCH_THRESHOLD, VOICEPRINTS_DB_PATH, VOICEPRINTS_FILE
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VoiceprintStore:
+    def __init__(self, db_path: str = VOICEPRINTS_DB_PATH, legacy_json: Optional[str] = VOICEPRINTS_FILE):
+        self.db_path = db_path
+        self.legacy_json = legacy_json
+        self._lock = threading.RLock()
+        self._loaded_mtime: Optional[float] = None
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self._raw = np.zeros((0, 0), dtype=np.float32)
+        self._unit = np.zeros((0, 0), dtype=np.float32)
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS voiceprints (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                embedding BLOB,
+                updated_at REAL
+            )
+            """
+        )
+        return conn
+
+    def _db_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.db_path)
+        except OSError:
+            return None
+
+    def _ensure_loaded(self):
+        """Load (or reload after another process wrote) unless local changes are pending."""
+        if self._dirty or self._deleted:
+            return
+        mtime = self._db_mtime()
+        if self._loaded_mtime is not None and mtime == self._loaded_mtime:
+            return
+        try:
+            conn = self._connect()
+            rows = conn.execute("SELECT id, name, embedding FROM voiceprints ORDER BY rowid").fetchall()
+            conn.close()
+        except Exception as exc:
+            print(f"[warn] Failed to load voiceprints: {exc}")
+            rows = []
+        self.ids = [r[0] for r in rows]
+        self.names = [r[1] for r in rows]
+        if rows:
+            self._raw = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        else:
+            self._raw = np.zeros((0, 0), dtype=np.float32)
+        self._unit = _unit_rows(self._raw) if rows else self._raw
+        self._loaded_mtime = self._db_mtime()
+        if not rows:
+            self._migrate_json()
+
+    def _migrate_json(self):
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+        try:
+            with open(self.legacy_json, "r") as f:
+                legacy = json.load(f)
+        except Exception as exc:
+            print(f"[warn] Could not read {self.legacy_json} for migration: {exc}")
+            return
+        for vid, info in legacy.items():
+            if info.get("embedding"):
+                self._append(vid, info.get("name", vid), np.asarray(info["embedding"], dtype=np.float32))
+        if self.flush():
+            os.replace(self.legacy_json, self.legacy_json + ".migrated")
+            print(f"[voiceprints] migrated {len(self.ids)} voiceprints from {self.legacy_json}")
+
+    def _append(self, vid: str, name: str, embedding: np.ndarray):
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        if self._raw.size and self._raw.shape[1] != embedding.shape[1]:
+            raise ValueError(f"voiceprint has {embedding.shape[1]} dims, store has {self._raw.shape[1]}")
+        self.ids.append(vid)
+        self.names.append(name)
+        self._raw = np.vstack([self._raw, embedding]) if self._raw.size else embedding
+        self._unit = np.vstack([self._unit, _unit_rows(embedding)]) if self._unit.size else _unit_rows(embedding)
+        self._dirty.add(vid)
+
+    def add(self, name: str, embedding: Sequence[float]) -> str:
+        with self._lock:
+            self._ensure_loaded()
+            vid = f"voice_{uuid.uuid4().hex[:12]}"
+            self._append(vid, name, np.asarray(embedding, dtype=np.float32))
+            return vid
+
+    def rename(self, old_name: str, new_name: str) -> int:
+        """Rename every voiceprint called `old_name`; returns how many changed."""
+        with self._lock:
+            self._ensure_loaded()
+            changed = 0
+            for i, name in enumerate(self.names):
+                if name == old_name and name != new_name:
+                    self.names[i] = new_name
+                    self._dirty.add(self.ids[i])
+                    changed += 1
+            return changed
+
+    def remove(self, vid: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            if vid not in self.ids:
+                return False
+            i = self.ids.index(vid)
+            del self.ids[i], self.names[i]
+            self._raw = np.delete(self._raw, i, axis=0)
+            self._unit = np.delete(self._unit, i, axis=0)
+            self._dirty.discard(vid)
+            self._deleted.add(vid)
+            return True
+
+    def match(
+        self, embeddings: np.ndarray, threshold: float = VOICEPRINT_MATCH_THRESHOLD
+    ) -> List[Optional[str]]:
+        """Best voiceprint name per embedding row, or None when nothing clears `threshold`."""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self._ensure_loaded()
+            if not self.ids or not len(embeddings):
+                return [None] * len(embeddings)
+            scores = _unit_rows(embeddings) @ self._unit.T
+            best = np.argmax(scores, axis=1)
+            names = list(self.names)
+        return [names[b] if scores[i, b] > threshold else None for i, b in enumerate(best)]
+
+    def match_speakers(
+        self, speaker_embeddings: Dict[str, np.ndarray], threshold: float = VOICEPRINT_MATCH_THRESHOLD
+    ) -> Dict[str, str]:
+        """Map speaker labels to voiceprint names for the ones that match."""
+        labels = list(speaker_embeddings)
+        if not labels:
+            return {}
+        names = self.match(np.stack([speaker_embeddings[l] for l in labels]), threshold)
+        return {label: name for label, name in zip(labels, names) if name}
+
+    def embedding_for(self, name: str) -> Optional[np.ndarray]:
+        """Unit mean of the voiceprints called `name`, or None."""
+        with self._lock:
+            self._ensure_loaded()
+            rows = [i for i, n in enumerate(self.names) if n == name]
+            if not rows:
+                return None
+            return _unit_rows(self._unit[rows].sum(axis=0))[0]
+
+    def flush(self) -> bool:
+        """Write pending changes in one transaction; returns True when something was written."""
+        with self._lock:
+            if not self._dirty and not self._deleted:
+                return False
+            now = time.time()
+            rows = [
+                (vid, self.names[i], self._raw[i].tobytes(), now)
+                for i, vid in enumerate(self.ids)
+                if vid in self._dirty
+            ]
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO voiceprints (id, name, embedding, updated_at) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    conn.executemany("DELETE FROM voiceprints WHERE id = ?", [(vid,) for vid in self._deleted])
+                conn.close()
+            except Exception as exc:
+                print(f"[warn] Failed to save voiceprints: {exc}")
+                return False
+            self._dirty.clear()
+            self._deleted.clear()
+            self._loaded_mtime = self._db_mtime()
+            return True
+
+    def all(self) -> List[Dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return [{"id": vid, "name": name} for vid, name in zip(self.ids, self.names)]
+
+
+_store: Optional[VoiceprintStore] = None
+_store_lock = threading.Lock()
+
 
-def load_voiceprints():
-    if os.path.exists(VOICEPRINTS_FILE):
-        with open(VOICEPRINTS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def get_store() -> VoiceprintStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = VoiceprintStore()
+        return _store
 
-def save_voiceprints(data):
-    with open(VOICEPRINTS_FILE, 'w') as f:
-        json.dump(data, f)
 
 def add_voiceprint(name, embedding):
-    vps = load_voiceprints()
-    vps[f"voice_{len(vps)}"] = {"name": name, "embedding": embedding}
-    save_voiceprints(vps)
+    store = get_store()
+    vid = store.add(name, embedding)
+    store.flush()
+    return vid